@@ -0,0 +1,574 @@
+"""자리 배치 HTTP JSON API 서버
+
+학교 정보 시스템 등에서 Streamlit 화면 없이 자리 배치를 요청할 수 있는 로컬 서버.
+자리 배치 생성/검사/엑셀 내보내기는 app.py의 함수를 그대로 사용한다.
+
+실행:
+    python api_server.py --port 8600 --workers 4
+
+엔드포인트 (자리 번호는 화면과 같이 1부터 시작):
+    GET  /health    서버 상태
+    GET  /metrics   처리량, 지연 시간 통계
+    POST /generate  자리 배치 생성
+    POST /validate  자리 배치 검사
+    POST /export    엑셀 파일(.xlsx) 내보내기
+    POST /export/bulk  여러 배치를 xlsx/CSV/JSON으로 묶은 ZIP 스트리밍
+
+요청 예시:
+    {"students": ["김자두", "백레몬"], "layout_type": "default", "rows": 5, "cols": 6,
+     "disabled_seats": [1], "pre_assigned_seats": {"3": "김자두"},
+     "distanced_students": [], "seat_constraints": {"백레몬": ["front"]},
+     "algorithm": "기본", "seed": 42, "group_count": 4}
+
+일괄 내보내기 요청 예시 (배치마다 위 형식, formats/views는 생략 가능):
+    {"arrangements": [{"name": "1반", "students": [...], "arrangement": {"1": "김자두"}}, ...],
+     "formats": ["xlsx", "csv", "json"], "views": ["student", "teacher"]}
+"""
+import argparse
+import json
+import multiprocessing
+import signal
+import threading
+import time
+import re
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import streamlit.logger
+
+# app.py를 streamlit run 없이 불러올 때 나오는 세션 상태 경고 숨기기
+streamlit.logger.set_log_level("error")
+
+import app
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+MAX_BODY_BYTES = 1024 * 1024
+MAX_SEED = 999999
+# 작업 프로세스의 시간 제한이 먼저 걸리도록 연결 스레드가 조금 더 기다리는 시간 (초)
+JOB_DEADLINE_GRACE = 1.0
+MAX_BULK_ARRANGEMENTS = 1000
+
+
+def parse_seat_number(seat, total_seats, key):
+    """1부터 시작하는 자리 번호를 자리 인덱스로 변환 (교실 밖 자리면 ValueError)"""
+    number = int(seat)
+    if not 1 <= number <= total_seats:
+        raise ValueError(f"{key}의 자리 번호는 1 이상 {total_seats} 이하여야 합니다: {seat}")
+    return number - 1
+
+
+def parse_seat_map(mapping, total_seats, key):
+    """{"자리 번호": 학생} 형식을 0부터 시작하는 자리 인덱스로 변환"""
+    return {parse_seat_number(seat, total_seats, key): student for seat, student in (mapping or {}).items()}
+
+
+def parse_arrangement(payload, config):
+    """요청 본문의 arrangement를 교실 설정에 맞춰 읽기"""
+    total_seats = app.get_total_seats(config["layout_type"], config["rows"], config["cols"])
+    return parse_seat_map(payload["arrangement"], total_seats, "arrangement")
+
+
+def format_seat_map(arrangement):
+    """자리 배치를 {"자리 번호": 학생} 형식으로 변환"""
+    return {str(seat + 1): student for seat, student in sorted(arrangement.items())}
+
+
+def parse_seat_constraints(mapping):
+    """{"학생": ["front", "aisle", "not_window"]} 형식의 자리 조건 읽기"""
+    constraints = {}
+    for student, rules in (mapping or {}).items():
+        unknown = [rule for rule in rules if rule not in app.SEAT_RULES]
+        if unknown:
+            raise ValueError(f"알 수 없는 자리 조건입니다: {', '.join(unknown)}")
+        constraints[str(student)] = list(rules)
+    return constraints
+
+
+def parse_bounded_int(payload, key, default, low, high):
+    """정수 값을 읽고 범위를 벗어나면 ValueError"""
+    value = int(payload.get(key, default))
+    if not low <= value <= high:
+        raise ValueError(f"{key}는 {low} 이상 {high} 이하여야 합니다.")
+    return value
+
+
+def parse_config(payload):
+    """요청 본문에서 교실 설정 읽기 (화면과 같은 크기 제한)"""
+    layout_type = payload.get("layout_type", "default")
+    if layout_type not in app.LAYOUT_TYPE_CODES:
+        raise ValueError(f"알 수 없는 배치 유형입니다: {layout_type}")
+    size_limit = app.LAYOUT_SIZE_LIMITS[layout_type]
+    rows = parse_bounded_int(payload, "rows", 5, 1, size_limit)
+    cols = parse_bounded_int(payload, "cols", 6, 1, size_limit)
+    students = [str(student) for student in payload["students"]]
+    total_seats = app.get_total_seats(layout_type, rows, cols)
+    if len(students) > total_seats:
+        raise ValueError(f"학생 수({len(students)}명)가 자리 수({total_seats}개)보다 많습니다.")
+    return {
+        "students": students,
+        "layout_type": layout_type,
+        "rows": rows,
+        "cols": cols,
+        "disabled_seats": [parse_seat_number(seat, total_seats, "disabled_seats")
+                           for seat in payload.get("disabled_seats", [])],
+        "pre_assigned_seats": parse_seat_map(payload.get("pre_assigned_seats"), total_seats, "pre_assigned_seats"),
+        "distanced_students": list(payload.get("distanced_students", [])),
+        "seat_constraints": parse_seat_constraints(payload.get("seat_constraints")),
+    }
+
+
+def parse_build_options(payload):
+    """요청 본문에서 알고리즘, 시드, 그룹 수 읽기"""
+    algorithm = payload.get("algorithm", "기본")
+    if algorithm not in app.ALGORITHMS:
+        raise ValueError(f"알 수 없는 배치 알고리즘입니다: {algorithm}")
+    return {
+        "algorithm": algorithm,
+        "seed": parse_bounded_int(payload, "seed", 42, 0, MAX_SEED),
+        "group_count": parse_bounded_int(payload, "group_count", 4, *app.GROUP_COUNT_RANGE),
+    }
+
+
+def run_generate(payload):
+    """자리 배치 생성 작업 (작업 프로세스에서 실행)"""
+    config = parse_config(payload)
+    options = parse_build_options(payload)
+    seed = options["seed"]
+    arrangement = app.build_arrangement(**options, **config)
+    return {
+        "arrangement": format_seat_map(arrangement),
+        "code": app.encode_arrangement(arrangement, config["students"], config["layout_type"],
+                                       config["rows"], config["cols"]),
+        "seed": seed,
+        # 자리 띄우기를 모두 지키지 못한 경우 등 (빈 목록이면 모든 조건 만족)
+        "problems": app.validate_arrangement(arrangement, **config),
+    }
+
+
+def run_validate(payload):
+    """자리 배치 검사 작업 (작업 프로세스에서 실행)"""
+    config = parse_config(payload)
+    problems = app.validate_arrangement(parse_arrangement(payload, config), **config)
+    return {"valid": not problems, "problems": problems}
+
+
+def run_export(payload):
+    """엑셀 내보내기 작업 (배치가 없으면 생성 후 내보내기)"""
+    config = parse_config(payload)
+    if "arrangement" in payload:
+        arrangement = parse_arrangement(payload, config)
+    else:
+        arrangement = app.build_arrangement(**parse_build_options(payload), **config)
+    excel_buffer = app.build_excel_workbook(
+        arrangement, config["layout_type"], config["rows"], config["cols"],
+        bool(payload.get("teacher_view", False))
+    )
+    return excel_buffer.getvalue()
+
+
+def parse_bulk_options(payload):
+    """일괄 내보내기 요청의 배치 목록과 파일 형식, 보기 방향 읽기"""
+    arrangements = payload["arrangements"]
+    if not isinstance(arrangements, list) or not arrangements:
+        raise ValueError("arrangements에 배치를 하나 이상 넣어주세요.")
+    if len(arrangements) > MAX_BULK_ARRANGEMENTS:
+        raise ValueError(f"한 번에 내보낼 수 있는 배치는 {MAX_BULK_ARRANGEMENTS}개까지입니다.")
+    formats = list(payload.get("formats", app.BULK_EXPORT_FORMATS))
+    views = list(payload.get("views", app.BULK_EXPORT_VIEWS))
+    unknown = [item for item in formats if item not in app.BULK_EXPORT_FORMATS]
+    unknown += [item for item in views if item not in app.BULK_EXPORT_VIEWS]
+    if unknown:
+        raise ValueError(f"알 수 없는 파일 형식 또는 보기 방향입니다: {', '.join(map(str, unknown))}")
+    if not formats:
+        raise ValueError("파일 형식을 하나 이상 선택해주세요.")
+    return arrangements, formats, views
+
+
+def get_export_name(entry, number):
+    """ZIP 안에서 쓸 배치 이름 (경로 구분자 등은 _로 바꿈)"""
+    name = re.sub(r'[\\/:*?"<>|\s]+', "_", str(entry.get("name", ""))).strip("._")
+    return f"{number:03d}_{name}" if name else f"{number:03d}"
+
+
+def run_export_files(entry, name, formats, views):
+    """배치 하나를 내보낼 파일 목록으로 만드는 작업 (배치가 없으면 생성)"""
+    config = parse_config(entry)
+    if "arrangement" in entry:
+        arrangement = parse_arrangement(entry, config)
+    else:
+        arrangement = app.build_arrangement(**parse_build_options(entry), **config)
+    return list(app.iter_arrangement_files(
+        name, arrangement, config["students"], config["layout_type"], config["rows"], config["cols"],
+        formats, views, entry.get("timestamp")
+    ))
+
+
+class JobTimeout(Exception):
+    """작업 프로세스 안에서 요청별 시간 제한을 넘김"""
+
+
+def raise_job_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def run_with_deadline(seconds, task, *args):
+    """작업 프로세스에서 시간 제한을 두고 작업 실행 (넘으면 JobTimeout)
+
+    SIGALRM이 있는 환경에서는 계산 중인 작업도 중단되어 작업 프로세스가
+    다음 요청을 바로 받을 수 있다.
+    """
+    if not hasattr(signal, "setitimer"):
+        return task(*args)
+    previous = signal.signal(signal.SIGALRM, raise_job_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return task(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+POST_ROUTES = {
+    "/generate": run_generate,
+    "/validate": run_validate,
+    "/export": run_export,
+}
+
+
+GET_ROUTES = ("/health", "/metrics")
+
+
+def get_endpoint_name(path):
+    """통계에 쓸 경로 이름 (알 수 없는 경로는 모두 other로 묶어 항목 수를 제한)"""
+    if path in GET_ROUTES or path in POST_ROUTES or path == "/export/bulk":
+        return path
+    return "other"
+
+
+class ServerMetrics:
+    """요청 수, 상태 코드, 지연 시간 통계 (스레드 안전)"""
+
+    def __init__(self, window=10000):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.total = 0
+        self.in_flight = 0
+        self.by_endpoint = Counter()
+        self.by_status = Counter()
+        # (완료 시각, 지연 시간) 최근 기록
+        self.recent = deque(maxlen=window)
+
+    def begin(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def finish(self, endpoint, status, latency):
+        with self.lock:
+            self.in_flight -= 1
+            self.total += 1
+            self.by_endpoint[get_endpoint_name(endpoint)] += 1
+            self.by_status[str(status)] += 1
+            self.recent.append((time.monotonic(), latency))
+
+    def snapshot(self):
+        with self.lock:
+            now = time.monotonic()
+            uptime = now - self.started
+            latencies = sorted(latency for _, latency in self.recent)
+            last_minute = sum(1 for finished, _ in self.recent if finished >= now - 60)
+
+            def percentile(q):
+                if not latencies:
+                    return 0.0
+                return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+
+            return {
+                "uptime_seconds": round(uptime, 1),
+                "requests_total": self.total,
+                "in_flight": self.in_flight,
+                "requests_per_second": round(self.total / uptime, 2) if uptime else 0.0,
+                "recent_requests_per_second": round(last_minute / min(uptime, 60), 2) if uptime else 0.0,
+                "latency_ms": {
+                    "p50": percentile(0.50),
+                    "p95": percentile(0.95),
+                    "p99": percentile(0.99),
+                    "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+                },
+                "by_endpoint": dict(self.by_endpoint),
+                "by_status": dict(self.by_status),
+            }
+
+
+class SeatingAPIHandler(BaseHTTPRequestHandler):
+    """자리 배치 API 요청 처리"""
+
+    server_version = "SeatingAPI/1.0"
+
+    def setup(self):
+        # 느린 클라이언트가 연결 스레드를 계속 붙잡지 않도록 소켓 시간 제한
+        self.timeout = self.server.request_timeout
+        super().setup()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def log_error(self, format, *args):
+        # 오류는 --verbose가 아니어도 출력
+        super().log_message(format, *args)
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_bytes(status, data, "application/json; charset=utf-8")
+
+    def send_bytes(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        started = time.perf_counter()
+        self.server.metrics.begin()
+        # 응답을 보내다 연결이 끊겨도 처리 중 요청 수가 남지 않도록 finally에서 집계
+        status = 500
+        try:
+            if self.path == "/health":
+                status = 200
+                self.send_json(status, {"status": "ok"})
+            elif self.path == "/metrics":
+                status = 200
+                metrics = self.server.metrics.snapshot()
+                metrics["workers"] = self.server.workers
+                self.send_json(status, metrics)
+            else:
+                status = 404
+                self.send_json(status, {"error": "없는 경로입니다."})
+        finally:
+            self.server.metrics.finish(self.path, status, time.perf_counter() - started)
+
+    def do_POST(self):
+        started = time.perf_counter()
+        self.server.metrics.begin()
+        status = 500
+        try:
+            status = self.handle_post()
+        finally:
+            self.server.metrics.finish(self.path, status, time.perf_counter() - started)
+
+    def handle_post(self):
+        task = POST_ROUTES.get(self.path)
+        if task is None and self.path != "/export/bulk":
+            self.send_json(404, {"error": "없는 경로입니다."})
+            return 404
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_BODY_BYTES:
+                self.send_json(413, {"error": "요청 본문이 너무 큽니다."})
+                return 413
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, OSError):
+            self.send_json(400, {"error": "JSON 본문을 읽을 수 없습니다."})
+            return 400
+
+        if self.path == "/export/bulk":
+            return self.handle_bulk_export(payload)
+
+        # 계산은 작업 프로세스 풀에서 요청별 시간 제한을 두고 실행
+        try:
+            result = self.server.run_job(task, payload)
+        except (JobTimeout, FutureTimeoutError):
+            self.send_json(504, {"error": "요청 처리 시간이 초과되었습니다."})
+            return 504
+        except BrokenProcessPool:
+            self.send_json(503, {"error": "작업 프로세스를 다시 시작하는 중입니다. 잠시 후 다시 시도해주세요."})
+            return 503
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            message = str(e) if isinstance(e, ValueError) else f"잘못된 요청입니다: {e!r}"
+            self.send_json(400, {"error": message})
+            return 400
+        except Exception as e:
+            self.log_error("작업 실패: %r", e)
+            self.send_json(500, {"error": "서버 내부 오류로 요청을 처리하지 못했습니다."})
+            return 500
+
+        if isinstance(result, bytes):
+            self.send_bytes(200, result, XLSX_MIME)
+        else:
+            self.send_json(200, result)
+        return 200
+
+    def handle_bulk_export(self, payload):
+        """배치별 파일을 작업 프로세스에서 만들고 ZIP 조각으로 바로 전송
+
+        작업 프로세스 수만큼만 미리 제출하므로 배치가 수백 개여도 메모리에는
+        그만큼의 파일과 ZIP 목차만 남는다. 응답을 시작한 뒤 실패한 배치는
+        ZIP 안에 오류 파일로 남긴다.
+        """
+        try:
+            arrangements, formats, views = parse_bulk_options(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            message = str(e) if isinstance(e, ValueError) else f"잘못된 요청입니다: {e!r}"
+            self.send_json(400, {"error": message})
+            return 400
+
+        self.send_response(200)
+        self.send_header("Content-Type", ZIP_MIME)
+        self.send_header("Content-Disposition", 'attachment; filename="arrangements.zip"')
+        # 길이를 미리 알 수 없으므로 연결을 닫아 응답 끝을 알림
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            for chunk in app.iter_zip_chunks(self.iter_bulk_files(arrangements, formats, views)):
+                self.wfile.write(chunk)
+        except OSError:
+            # 클라이언트가 연결을 끊음
+            pass
+        return 200
+
+    def iter_bulk_files(self, arrangements, formats, views):
+        pending = deque()
+        entries = iter(enumerate(arrangements, 1))
+
+        def submit_next():
+            for number, entry in entries:
+                name = get_export_name(entry, number) if isinstance(entry, dict) else f"{number:03d}"
+                pending.append((name, self.server.submit_job(run_export_files, entry, name, formats, views)))
+                return
+
+        for _ in range(self.server.workers):
+            submit_next()
+        while pending:
+            name, future = pending.popleft()
+            submit_next()
+            try:
+                yield from self.server.wait_job(future)
+            except (JobTimeout, FutureTimeoutError):
+                yield f"{name}_오류.txt", "처리 시간이 초과되었습니다.".encode("utf-8")
+            except BrokenProcessPool:
+                yield f"{name}_오류.txt", "작업 프로세스가 다시 시작되어 처리하지 못했습니다.".encode("utf-8")
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                message = str(e) if isinstance(e, ValueError) else f"잘못된 배치입니다: {e!r}"
+                yield f"{name}_오류.txt", message.encode("utf-8")
+            except Exception as e:
+                self.log_error("일괄 내보내기 작업 실패: %r", e)
+                yield f"{name}_오류.txt", "서버 내부 오류로 처리하지 못했습니다.".encode("utf-8")
+
+
+class SeatingAPIServer(HTTPServer):
+    """연결 처리 스레드 수와 계산 프로세스 수가 제한된 HTTP 서버
+
+    연결은 고정 크기 스레드 풀에서 처리하고, 풀이 가득 차면 새 연결은
+    수락하지 않고 소켓 대기열(backlog)에 남겨 두어 메모리 사용이 늘지 않게 한다.
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, address, workers=4, request_timeout=10.0, connection_threads=None,
+                 verbose=False):
+        super().__init__(address, SeatingAPIHandler)
+        self.workers = workers
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+        self.metrics = ServerMetrics()
+        self.executor_lock = threading.Lock()
+        self.executor = self.create_executor()
+        # 작업 프로세스를 미리 띄워 첫 요청의 지연을 줄임
+        list(self.executor.map(time.sleep, [0.5] * workers))
+        connection_threads = connection_threads or workers * 4
+        self.connection_pool = ThreadPoolExecutor(max_workers=connection_threads)
+        self.connection_slots = threading.BoundedSemaphore(connection_threads)
+
+    def create_executor(self):
+        # 연결 스레드가 도는 중에 fork 하지 않도록 spawn으로 작업 프로세스를 띄움
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def submit_job(self, task, *args):
+        with self.executor_lock:
+            future = self.executor.submit(run_with_deadline, self.request_timeout, task, *args)
+            # 멈춘 작업을 정리할 때 어느 풀의 작업인지 알 수 있도록 기록
+            future.executor = self.executor
+            return future
+
+    def wait_job(self, future):
+        """작업 결과 기다리기
+
+        대기열에 있던 작업은 취소하고, 실행 중인데 시간 제한 뒤에도 끝나지 않는
+        작업(SIGALRM이 없거나 C 코드에서 멈춤)은 작업 프로세스를 다시 띄워 정리한다.
+        """
+        try:
+            return future.result(timeout=self.request_timeout + JOB_DEADLINE_GRACE)
+        except FutureTimeoutError:
+            if not future.cancel():
+                watchdog = threading.Timer(self.request_timeout, self.recycle_if_stuck,
+                                           (future, future.executor))
+                watchdog.daemon = True
+                watchdog.start()
+            raise
+
+    def run_job(self, task, *args):
+        return self.wait_job(self.submit_job(task, *args))
+
+    def recycle_if_stuck(self, future, executor):
+        """시간 제한을 넘긴 작업이 아직 실행 중이면 작업 프로세스 풀을 새로 만듦"""
+        if future.done():
+            return
+        with self.executor_lock:
+            if self.executor is not executor:
+                return
+            self.executor = self.create_executor()
+        # 멈춘 작업 프로세스 종료 (같은 풀에서 실행 중이던 다른 작업은 BrokenProcessPool)
+        for process in list(executor._processes.values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def process_request(self, request, client_address):
+        self.connection_slots.acquire()
+        self.connection_pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.connection_slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.connection_pool.shutdown(wait=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="자리 배치 HTTP JSON API 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=4, help="계산 프로세스 수")
+    parser.add_argument("--timeout", type=float, default=10.0, help="요청별 시간 제한 (초)")
+    parser.add_argument("--verbose", action="store_true", help="요청 로그 출력")
+    args = parser.parse_args()
+
+    server = SeatingAPIServer((args.host, args.port), workers=args.workers,
+                              request_timeout=args.timeout, verbose=args.verbose)
+    print(f"자리 배치 API 서버: http://{args.host}:{args.port} (작업 프로세스 {args.workers}개)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
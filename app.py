@@ -3,9 +3,25 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
+import networkx as nx
 from plotly.subplots import make_subplots
 import random
-from io import BytesIO
+import sys
+import csv
+import json
+import zipfile
+import threading
+import base64
+import heapq
+import multiprocessing
+import os
+import time
+import hashlib
+import struct
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO, StringIO
 import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill
 from openpyxl.utils.dataframe import dataframe_to_rows
@@ -29,6 +45,8 @@ if 'disabled_seats' not in st.session_state:
     st.session_state.disabled_seats = []
 if 'distanced_students' not in st.session_state:
     st.session_state.distanced_students = []
+if 'seat_constraints' not in st.session_state:
+    st.session_state.seat_constraints = {}
 if 'layout_type' not in st.session_state:
     st.session_state.layout_type = "default"
 if 'rows' not in st.session_state:
@@ -38,6 +56,11 @@ if 'cols' not in st.session_state:
 if 'is_teacher_view' not in st.session_state:
     st.session_state.is_teacher_view = False
 
+def apply_random_seed(seed):
+    """랜덤 시드를 적용하고 고급 옵션의 시드 입력란도 같은 값으로 맞추기 (위젯이 그려지기 전에 호출)"""
+    st.session_state.random_seed = seed
+    st.session_state.random_seed_input = seed
+
 def initialize_session_state():
     """세션 상태 초기화 함수"""
     if 'students' not in st.session_state:
@@ -50,6 +73,8 @@ def initialize_session_state():
         st.session_state.disabled_seats = []
     if 'distanced_students' not in st.session_state:
         st.session_state.distanced_students = []
+    if 'seat_constraints' not in st.session_state:
+        st.session_state.seat_constraints = {}
 
 def get_seat_coordinates(index, layout_type, rows, cols):
     """자리 인덱스를 좌표로 변환"""
@@ -84,30 +109,192 @@ def is_too_close(index1, index2, layout_type, rows, cols):
         return True
     return False
 
+# 배치 형태별 좌표 표 캐시 크기 (배치 유형, 행, 열, 교사 기준 보기 조합 수)
+GEOMETRY_CACHE_SIZE = 64
+
+class LayoutGeometryCache:
+    """배치 형태별 좌표 표를 보관하는 프로세스 전역 LRU 캐시 (스레드 안전)
+    
+    표는 여러 세션이 함께 읽으므로 만든 뒤에는 수정하지 않는다.
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, build):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+        
+        geometry = build(*key)
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = geometry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return geometry
+    
+    def info(self):
+        """캐시 항목 수, 적중/실패 수, 대략적인 메모리 사용량(바이트)"""
+        with self.lock:
+            geometries = list(self.entries.values())
+            info = {'entries': len(geometries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+        seen = set()
+        info['bytes'] = sum(get_deep_size(geometry, seen) for geometry in geometries)
+        return info
+
+def get_deep_size(obj, seen=None):
+    """객체와 그 안의 dict/tuple/list 항목까지 포함한 메모리 크기(바이트)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(get_deep_size(key, seen) + get_deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (tuple, list, set, frozenset)):
+        size += sum(get_deep_size(item, seen) for item in obj)
+    return size
+
+@st.cache_resource(show_spinner=False)
+def get_geometry_cache():
+    """모든 세션이 공유하는 좌표 표 캐시"""
+    return LayoutGeometryCache(GEOMETRY_CACHE_SIZE)
+
+# 스크립트가 실행될 때마다 공유 캐시를 한 번만 찾아 둠
+geometry_cache = get_geometry_cache()
+
+def build_layout_geometry(layout_type, rows, cols, is_teacher_view):
+    """배치 형태의 좌표 표 만들기
+    
+    coords: 자리별 (행, 열) 좌표 / display: 자리 배치도의 (x, y) 위치
+    neighbors: 자리별 is_too_close 자리 집합
+    excel_header, excel_row_labels, excel_cells, excel_merges: 엑셀 표 구조
+    (excel_cells는 자리별 (데이터 행, 열) 위치, 0열은 행 이름)
+    """
+    total_seats = get_total_seats(layout_type, rows, cols)
+    display_cols = get_layout_columns(layout_type, cols)
+    coords = tuple(get_seat_coordinates(i, layout_type, rows, cols) for i in range(total_seats))
+    
+    # 교사 기준 보기일 때 좌표 반전
+    if is_teacher_view:
+        display = tuple((display_cols - 1 - col, rows - 1 - row) for row, col in coords)
+    else:
+        display = tuple((col, row) for row, col in coords)
+    
+    # 주변 2칸 안에서 가까운 자리 찾기
+    index_by_coord = {coord: i for i, coord in enumerate(coords)}
+    neighbors = []
+    for i, (row, col) in enumerate(coords):
+        close_seats = set()
+        for d_row in range(-2, 3):
+            for d_col in range(-2, 3):
+                other = index_by_coord.get((row + d_row, col + d_col))
+                if other is not None and other != i and is_too_close(i, other, layout_type, rows, cols):
+                    close_seats.add(other)
+        neighbors.append(frozenset(close_seats))
+    
+    excel_cells = [None] * total_seats
+    excel_merges = []
+    if layout_type == "pairs":
+        # 분단형 배치: 분단 수 = cols, 분단별 행 수 = rows
+        sections = cols
+        rows_per_section = rows
+        header1 = ['']
+        header2 = ['행']
+        for s in range(sections):
+            section_label = f"{sections - s}분단" if is_teacher_view else f"{s + 1}분단"
+            header1.extend([section_label, ''])
+            header2.extend(['왼쪽', '오른쪽'])
+            excel_merges.append((1, s * 2 + 2, 1, s * 2 + 3))
+        excel_header = (tuple(header1), tuple(header2))
+        excel_row_labels = tuple(f"{rows_per_section - r}행" if is_teacher_view else f"{r + 1}행"
+                                 for r in range(rows_per_section))
+        
+        for r in range(rows_per_section):
+            for s in range(sections):
+                read_section = sections - 1 - s if is_teacher_view else s
+                read_row = rows_per_section - 1 - r if is_teacher_view else r
+                
+                student_left_index = (read_section * rows_per_section * 2) + (read_row * 2)
+                student_right_index = student_left_index + 1
+                
+                left_index = student_right_index if is_teacher_view else student_left_index
+                right_index = student_left_index if is_teacher_view else student_right_index
+                excel_cells[left_index] = (r, s * 2 + 1)
+                excel_cells[right_index] = (r, s * 2 + 2)
+    else:
+        # 기본 배치
+        excel_header = ((' ',) + tuple(f"{cols - c}열" if is_teacher_view else f"{c + 1}열"
+                                       for c in range(cols)),)
+        excel_row_labels = tuple(f"{rows - r}행" if is_teacher_view else f"{r + 1}행" for r in range(rows))
+        
+        for r in range(rows):
+            for c in range(cols):
+                read_row = rows - 1 - r if is_teacher_view else r
+                read_col = cols - 1 - c if is_teacher_view else c
+                excel_cells[read_row * cols + read_col] = (r, c + 1)
+    
+    return {
+        'layout_type': layout_type,
+        'rows': rows,
+        'display_cols': display_cols,
+        'total_seats': total_seats,
+        'coords': coords,
+        'display': display,
+        'neighbors': tuple(neighbors),
+        'excel_header': excel_header,
+        'excel_row_labels': excel_row_labels,
+        'excel_cells': tuple(excel_cells),
+        'excel_merges': tuple(excel_merges),
+    }
+
+def get_layout_geometry(layout_type, rows, cols, is_teacher_view=False):
+    """배치 형태의 좌표 표 (프로세스 전역 캐시에서 공유)"""
+    return geometry_cache.get((layout_type, int(rows), int(cols), bool(is_teacher_view)),
+                              build_layout_geometry)
+
+def get_arrangement_table(seating_arrangement, geometry):
+    """엑셀/CSV용 자리 배치 표 (머리글 행 + 행 이름이 붙은 데이터 행)"""
+    data_rows = [[label] + [""] * geometry['display_cols'] for label in geometry['excel_row_labels']]
+    for seat, (r, c) in enumerate(geometry['excel_cells']):
+        data_rows[r][c] = seating_arrangement.get(seat, "")
+    return [list(header) for header in geometry['excel_header']] + data_rows
+
 def create_seating_chart(seating_arrangement, layout_type, rows, cols, is_teacher_view=False):
     """자리 배치도 생성"""
     if layout_type == "pairs":
-        return create_pairs_layout(seating_arrangement, rows, cols, is_teacher_view)
+        return create_pairs_layout(seating_arrangement, cols, rows, is_teacher_view)
     else:
         return create_default_layout(seating_arrangement, rows, cols, is_teacher_view)
 
 def create_default_layout(seating_arrangement, rows, cols, is_teacher_view=False):
     """기본 격자형 자리 배치도 생성"""
+    geometry = get_layout_geometry("default", rows, cols, is_teacher_view)
+    return draw_seating_chart(seating_arrangement, geometry, "자리 배치도")
+
+def create_pairs_layout(seating_arrangement, sections, rows_per_section, is_teacher_view=False):
+    """분단형 자리 배치도 생성"""
+    geometry = get_layout_geometry("pairs", rows_per_section, sections, is_teacher_view)
+    return draw_seating_chart(seating_arrangement, geometry, "자리 배치도 (분단형)")
+
+def draw_seating_chart(seating_arrangement, geometry, title):
+    """좌표 표를 이용해 자리 배치도 그리기"""
     fig = go.Figure()
+    rows = geometry['rows']
+    display_cols = geometry['display_cols']
     
     # 자리 그리기
-    for i in range(rows * cols):
-        row = i // cols
-        col = i % cols
-        
-        # 교사 기준 보기일 때 좌표 반전
-        if is_teacher_view:
-            display_row = rows - 1 - row
-            display_col = cols - 1 - col
-        else:
-            display_row = row
-            display_col = col
-        
+    for i, (display_col, display_row) in enumerate(geometry['display']):
         student_name = seating_arrangement.get(i, "")
         
         # 자리 색상 설정
@@ -140,17 +327,20 @@ def create_default_layout(seating_arrangement, rows, cols, is_teacher_view=False
             yanchor="middle"
         )
     
+    # 자리 클릭(선택/바꾸기)용 투명 마커 (점 순서 = 자리 인덱스)
+    add_seat_click_targets(fig, geometry['display'])
+    
     # 교탁 표시
     fig.add_shape(
         type="rect",
         x0=-0.5, y0=rows + 0.5,
-        x1=cols - 0.5, y1=rows + 1.5,
+        x1=display_cols - 0.5, y1=rows + 1.5,
         fillcolor="lightyellow",
         line=dict(color="black", width=2)
     )
     
     fig.add_annotation(
-        x=cols/2 - 0.5, y=rows + 1,
+        x=display_cols/2 - 0.5, y=rows + 1,
         text="교탁",
         showarrow=False,
         font=dict(size=14, color="black", family="Arial Black"),
@@ -159,9 +349,9 @@ def create_default_layout(seating_arrangement, rows, cols, is_teacher_view=False
     )
     
     fig.update_layout(
-        title="자리 배치도",
+        title=title,
         xaxis=dict(
-            range=[-1, cols],
+            range=[-1, display_cols],
             showgrid=True,
             zeroline=False,
             showticklabels=False
@@ -182,162 +372,544 @@ def create_default_layout(seating_arrangement, rows, cols, is_teacher_view=False
     
     return fig
 
-def create_pairs_layout(seating_arrangement, sections, rows_per_section, is_teacher_view=False):
-    """분단형 자리 배치도 생성"""
-    fig = go.Figure()
+# 자리 조건: 학생별로 앉을 수 있는 자리를 좌표 규칙으로 제한
+# 창문은 1열(분단형은 1분단 왼쪽) 쪽으로 가정
+WINDOW_COLUMN = 0
+
+def get_layout_columns(layout_type, cols):
+    """좌표 기준 전체 열 수 (분단형은 분단당 2열)"""
+    return cols * 2 if layout_type == "pairs" else cols
+
+def is_front_seat(row, col, layout_type, rows, cols):
+    return row < 2
+
+def is_aisle_seat(row, col, layout_type, rows, cols):
+    last_col = get_layout_columns(layout_type, cols) - 1
+    if layout_type == "pairs":
+        # 분단 사이 통로에 붙은 자리 (짝의 바깥쪽 자리 중 벽 쪽 제외)
+        return (col % 2 == 0 and col > 0) or (col % 2 == 1 and col < last_col)
+    return 0 < col < last_col
+
+def is_not_window_seat(row, col, layout_type, rows, cols):
+    return col != WINDOW_COLUMN
+
+SEAT_RULES = {
+    "front": ("앞 두 줄", is_front_seat),
+    "aisle": ("통로 쪽", is_aisle_seat),
+    "not_window": ("창가 제외", is_not_window_seat),
+}
+
+def get_eligible_seats(rule_keys, candidate_seats, layout_type, rows, cols):
+    """자리 조건을 모두 만족하는 자리 목록"""
+    rules = [SEAT_RULES[key][1] for key in rule_keys]
+    eligible = []
+    for seat in candidate_seats:
+        row, col = get_seat_coordinates(seat, layout_type, rows, cols)
+        if all(rule(row, col, layout_type, rows, cols) for rule in rules):
+            eligible.append(seat)
+    return eligible
+
+# 자리 조건 학생끼리 자리 띄우기를 지키는 매칭을 찾을 때 다시 시도하는 횟수
+ELIGIBLE_MATCH_ATTEMPTS = 50
+
+def hopcroft_karp(adjacency):
+    """이분 그래프 최대 매칭 (Hopcroft-Karp, O(E√V))
     
-    total_desks = sections * rows_per_section * 2
+    adjacency는 {왼쪽 정점: [오른쪽 정점, ...]}이고 {왼쪽: 오른쪽} 매칭을 반환한다.
+    """
+    match_left = {u: None for u in adjacency}
+    match_right = {}
     
-    for i in range(total_desks):
-        section = i // (rows_per_section * 2)
-        index_in_section = i % (rows_per_section * 2)
-        row = index_in_section // 2
-        col = (section * 2) + (index_in_section % 2)
-        
-        # 교사 기준 보기일 때 좌표 반전
-        if is_teacher_view:
-            display_row = rows_per_section - 1 - row
-            display_col = (sections * 2) - 1 - col
-        else:
-            display_row = row
-            display_col = col
-        
-        student_name = seating_arrangement.get(i, "")
-        
-        # 자리 색상 설정
-        if i in st.session_state.disabled_seats:
-            color = "lightgray"
-            text_color = "gray"
-        elif student_name:
-            color = "lightblue"
-            text_color = "black"
-        else:
-            color = "white"
-            text_color = "gray"
-        
-        # 자리 사각형 그리기
-        fig.add_shape(
-            type="rect",
-            x0=display_col - 0.4, y0=display_row - 0.4,
-            x1=display_col + 0.4, y1=display_row + 0.4,
-            fillcolor=color,
-            line=dict(color="black", width=2)
-        )
-        
-        # 자리 번호와 학생 이름 표시
-        fig.add_annotation(
-            x=display_col, y=display_row,
-            text=f"{i+1}<br>{student_name}",
-            showarrow=False,
-            font=dict(size=10, color=text_color),
-            xanchor="center",
-            yanchor="middle"
-        )
+    def bfs():
+        # 짝이 없는 왼쪽 정점부터 교대 경로 층 나누기
+        dist = {}
+        frontier = [u for u in adjacency if match_left[u] is None]
+        for u in frontier:
+            dist[u] = 0
+        found = False
+        while frontier:
+            next_frontier = []
+            for u in frontier:
+                for v in adjacency[u]:
+                    w = match_right.get(v)
+                    if w is None:
+                        found = True
+                    elif w not in dist:
+                        dist[w] = dist[u] + 1
+                        next_frontier.append(w)
+            frontier = next_frontier
+        return found, dist
     
-    # 교탁 표시
-    fig.add_shape(
-        type="rect",
-        x0=-0.5, y0=rows_per_section + 0.5,
-        x1=(sections * 2) - 0.5, y1=rows_per_section + 1.5,
-        fillcolor="lightyellow",
-        line=dict(color="black", width=2)
-    )
+    def dfs(u, dist):
+        # 층을 따라 내려가는 증가 경로를 반복문으로 탐색
+        stack = [(u, iter(adjacency[u]))]
+        path = []
+        while stack:
+            node, neighbors = stack[-1]
+            advanced = False
+            for v in neighbors:
+                w = match_right.get(v)
+                if w is None:
+                    path.append((node, v))
+                    for left, right in path:
+                        match_left[left] = right
+                        match_right[right] = left
+                    return True
+                if dist.get(w) == dist[node] + 1:
+                    path.append((node, v))
+                    stack.append((w, iter(adjacency[w])))
+                    advanced = True
+                    break
+            if not advanced:
+                dist[node] = None
+                stack.pop()
+                if path:
+                    path.pop()
+        return False
     
-    fig.add_annotation(
-        x=(sections * 2)/2 - 0.5, y=rows_per_section + 1,
-        text="교탁",
-        showarrow=False,
-        font=dict(size=14, color="black", family="Arial Black"),
-        xanchor="center",
-        yanchor="middle"
-    )
+    while True:
+        found, dist = bfs()
+        if not found:
+            break
+        for u in adjacency:
+            if match_left[u] is None:
+                dfs(u, dist)
     
-    fig.update_layout(
-        title="자리 배치도 (분단형)",
-        xaxis=dict(
-            range=[-1, sections * 2],
-            showgrid=True,
-            zeroline=False,
-            showticklabels=False
-        ),
-        yaxis=dict(
-            range=[-0.5, rows_per_section + 2],
-            showgrid=True,
-            zeroline=False,
-            showticklabels=False,
-            scaleanchor="x",
-            scaleratio=1
-        ),
-        showlegend=False,
-        width=600,
-        height=400,
-        margin=dict(l=50, r=50, t=50, b=50)
-    )
+    return {u: v for u, v in match_left.items() if v is not None}
+
+def find_blocking_students(adjacency, matching):
+    """매칭되지 못한 학생에게서 교대 경로로 닿는 학생 집합 (조건을 함께 막는 학생들)
     
-    return fig
+    이 학생들이 앉을 수 있는 자리 수가 학생 수보다 적어서 모두 배치할 수 없다.
+    """
+    match_right = {seat: student for student, seat in matching.items()}
+    blocking = [u for u in adjacency if u not in matching]
+    seen = set(blocking)
+    frontier = list(blocking)
+    while frontier:
+        next_frontier = []
+        for u in frontier:
+            for v in adjacency[u]:
+                w = match_right.get(v)
+                if w is not None and w not in seen:
+                    seen.add(w)
+                    blocking.append(w)
+                    next_frontier.append(w)
+        frontier = next_frontier
+    return blocking
 
-def generate_seating_arrangement():
-    """자리 배치 생성"""
-    if not st.session_state.students:
-        st.error("먼저 학생 명단을 입력해주세요.")
-        return
+def count_distancing_conflicts(seats, close_seats):
+    """자리 목록 중 서로 너무 가까운 쌍의 수"""
+    seats = list(seats)
+    return sum(1 for k, seat in enumerate(seats) for other in seats[k + 1:] if other in close_seats[seat])
+
+def assign_eligible_seats(seat_constraints, free_seats, layout_type, rows, cols, rng=random,
+                          distanced_students=(), fixed_distanced_seats=()):
+    """자리 조건이 있는 학생들을 조건에 맞는 자리에 배정 (불가능하면 ValueError)
     
-    # 랜덤 시드 설정
-    random_seed = getattr(st.session_state, 'random_seed', 42)
-    random.seed(random_seed)
-    np.random.seed(random_seed)
+    자리 조건과 자리 띄우기가 모두 있는 학생은 서로, 그리고 이미 앉은 자리 띄우기
+    학생(fixed_distanced_seats)과 가까운 학생이 가장 적은 자리를 먼저 무작위로 고르고
+    나머지 학생을 매칭한다. ELIGIBLE_MATCH_ATTEMPTS번 안에 위반 없는 매칭을 찾지 못하면
+    시도한 매칭 중 위반이 가장 적은 매칭을 쓴다.
+    """
+    students = list(seat_constraints)
+    rng.shuffle(students)
+    adjacency = {}
+    for student in students:
+        seats = get_eligible_seats(seat_constraints[student], free_seats, layout_type, rows, cols)
+        rng.shuffle(seats)
+        adjacency[student] = seats
+    
+    matching = hopcroft_karp(adjacency)
+    if len(matching) < len(students):
+        order = {student: i for i, student in enumerate(seat_constraints)}
+        blocking = sorted(find_blocking_students(adjacency, matching), key=order.get)
+        raise ValueError(f"자리 조건을 모두 만족하는 배치가 없습니다. 조건을 확인할 학생: {', '.join(blocking)}")
+    
+    distanced = [student for student in students if student in set(distanced_students)]
+    if not distanced:
+        return {seat: student for student, seat in matching.items()}
+    
+    close_seats = get_layout_geometry(layout_type, rows, cols)['neighbors']
+    fixed_distanced_seats = list(fixed_distanced_seats)
+    
+    def count_conflicts(assignment):
+        seats = [assignment[student] for student in distanced]
+        return (count_distancing_conflicts(seats, close_seats)
+                + sum(1 for seat in seats for fixed in fixed_distanced_seats if fixed in close_seats[seat]))
+    
+    best, best_conflicts = matching, count_conflicts(matching)
+    for _ in range(ELIGIBLE_MATCH_ATTEMPTS):
+        if best_conflicts == 0:
+            break
+        # 자리 띄우기 학생을 하나씩 가까운 학생이 가장 적은 자리에 앉히고 나머지는 이분 매칭
+        rng.shuffle(distanced)
+        chosen = {}
+        taken = list(fixed_distanced_seats)
+        for student in distanced:
+            open_seats = [seat for seat in adjacency[student] if seat not in chosen.values()]
+            if not open_seats:
+                break
+            close_counts = [sum(1 for other in taken if other in close_seats[seat]) for seat in open_seats]
+            fewest = min(close_counts)
+            chosen[student] = rng.choice([seat for seat, count in zip(open_seats, close_counts) if count == fewest])
+            taken.append(chosen[student])
+        if len(chosen) < len(distanced):
+            continue
+        rest = {student: [seat for seat in adjacency[student] if seat not in chosen.values()]
+                for student in students if student not in chosen}
+        rest_matching = hopcroft_karp(rest)
+        if len(rest_matching) < len(rest):
+            continue
+        candidate = {**rest_matching, **chosen}
+        candidate_conflicts = count_conflicts(candidate)
+        if candidate_conflicts < best_conflicts:
+            best, best_conflicts = candidate, candidate_conflicts
+    
+    return {seat: student for student, seat in best.items()}
+
+def build_arrangement(students, layout_type, rows, cols, disabled_seats=(), pre_assigned_seats=None,
+                      distanced_students=(), algorithm="기본", seed=42, partner_counts=None,
+                      seat_constraints=None, group_count=4):
+    """세션 상태 없이 자리 배치 생성 (배치할 수 없으면 ValueError)"""
+    if not students:
+        raise ValueError("먼저 학생 명단을 입력해주세요.")
+    
+    if algorithm == "균등 샘플링":
+        # 기본 배치에서 시작한 마르코프 연쇄의 burn-in 이후 상태
+        return create_swap_chain(students, layout_type, rows, cols, disabled_seats, pre_assigned_seats,
+                                 distanced_students, seat_constraints, seed).get_arrangement()
+    
+    # 시드별 난수 생성기 (같은 시드면 같은 배치)
+    rng = random.Random(seed)
+    pre_assigned_seats = pre_assigned_seats or {}
     
     # 총 자리 수 계산
-    if st.session_state.layout_type == "pairs":
-        total_seats = st.session_state.rows * st.session_state.cols * 2
-    else:
-        total_seats = st.session_state.rows * st.session_state.cols
+    total_seats = get_total_seats(layout_type, rows, cols)
     
     # 사용 가능한 자리 계산
+    disabled_seats = set(disabled_seats)
     available_seats = [i for i in range(total_seats) 
-                      if i not in st.session_state.disabled_seats 
-                      and i not in st.session_state.pre_assigned_seats]
+                      if i not in disabled_seats 
+                      and i not in pre_assigned_seats]
     
-    if len(available_seats) < len(st.session_state.students):
-        st.error(f"사용 가능한 자리({len(available_seats)}개)가 학생 수({len(st.session_state.students)}명)보다 적습니다.")
-        return
+    if len(available_seats) < len(students):
+        raise ValueError(f"사용 가능한 자리({len(available_seats)}개)가 학생 수({len(students)}명)보다 적습니다.")
     
     # 사전 지정된 자리 배치
-    final_arrangement = st.session_state.pre_assigned_seats.copy()
-    pre_assigned_students = set(st.session_state.pre_assigned_seats.values())
+    final_arrangement = dict(pre_assigned_seats)
+    pre_assigned_students = set(pre_assigned_seats.values())
+    
+    # 자리 조건이 있는 학생들을 이분 매칭으로 먼저 배치 (이후 사전 지정과 같이 취급)
+    constrained = {student: rules for student, rules in (seat_constraints or {}).items()
+                   if rules and student in students and student not in pre_assigned_students}
+    if constrained:
+        fixed_distanced_seats = [seat for seat, student in pre_assigned_seats.items()
+                                 if student in distanced_students]
+        eligible_arrangement = assign_eligible_seats(
+            constrained, available_seats, layout_type, rows, cols, rng,
+            distanced_students, fixed_distanced_seats
+        )
+        final_arrangement.update(eligible_arrangement)
+        pre_assigned_students.update(eligible_arrangement.values())
+        available_seats = [i for i in available_seats if i not in eligible_arrangement]
+    
+    # 이미 앉은 자리 띄우기 학생들의 자리
+    placed_distanced_seats = [seat for seat, student in final_arrangement.items()
+                              if student in distanced_students]
     
     # 자리 띄우기 대상 학생들
-    distanced_students = [s for s in st.session_state.distanced_students 
+    distanced_students = [s for s in distanced_students 
                          if s not in pre_assigned_students]
     
     # 일반 학생들
-    regular_students = [s for s in st.session_state.students 
+    regular_students = [s for s in students 
                        if s not in pre_assigned_students and s not in distanced_students]
     
     # 배치 알고리즘 선택
-    algorithm = getattr(st.session_state, 'algorithm', '기본')
-    
     if algorithm == "균형 배치":
-        final_arrangement = generate_balanced_arrangement(
+        generate = generate_balanced_arrangement
+    elif algorithm == "그룹 분산":
+        return generate_group_distributed_arrangement(
             final_arrangement, distanced_students, regular_students, 
-            available_seats, st.session_state.layout_type, 
-            st.session_state.rows, st.session_state.cols
+            available_seats, layout_type, rows, cols, rng, group_count, placed_distanced_seats
         )
-    elif algorithm == "그룹 분산":
-        final_arrangement = generate_group_distributed_arrangement(
+    elif algorithm == "짝꿍 최적화":
+        return generate_pair_matched_arrangement(
             final_arrangement, distanced_students, regular_students, 
-            available_seats, st.session_state.layout_type, 
-            st.session_state.rows, st.session_state.cols
+            available_seats, layout_type, rows, cols, rng, partner_counts, placed_distanced_seats
         )
     else:
         # 기본 알고리즘
-        final_arrangement = generate_default_arrangement(
-            final_arrangement, distanced_students, regular_students, 
-            available_seats, st.session_state.layout_type, 
-            st.session_state.rows, st.session_state.cols
+        generate = generate_default_arrangement
+    
+    return generate(
+        final_arrangement, distanced_students, regular_students, 
+        available_seats, layout_type, rows, cols, rng, placed_distanced_seats
+    )
+
+def add_seat_click_targets(fig, seat_positions):
+    """자리 중심에 클릭할 수 있는 투명 마커 추가"""
+    fig.add_trace(go.Scatter(
+        x=[x for x, _ in seat_positions],
+        y=[y for _, y in seat_positions],
+        mode="markers",
+        marker=dict(size=36, color="rgba(0,0,0,0)"),
+        hovertext=[f"{i+1}번 자리" for i in range(len(seat_positions))],
+        hoverinfo="text"
+    ))
+
+def get_close_seats(index, layout_type, rows, cols):
+    """is_too_close 기준으로 가까운 자리 목록 (캐시된 좌표 표 사용)"""
+    return sorted(get_layout_geometry(layout_type, rows, cols)['neighbors'][index])
+
+def swap_seats(arrangement, seat1, seat2):
+    """두 자리의 학생 맞바꾸기 (빈 자리와도 가능)"""
+    student1 = arrangement.pop(seat1, None)
+    student2 = arrangement.pop(seat2, None)
+    if student1:
+        arrangement[seat2] = student1
+    if student2:
+        arrangement[seat1] = student2
+
+def find_distancing_conflicts(arrangement, seats, distanced_students, layout_type, rows, cols):
+    """바뀐 자리 주변만 확인해 자리 띄우기 학생끼리 가까운 쌍 찾기"""
+    distanced = set(distanced_students)
+    conflicts = set()
+    for seat in seats:
+        if arrangement.get(seat) not in distanced:
+            continue
+        for other in get_close_seats(seat, layout_type, rows, cols):
+            if arrangement.get(other) in distanced:
+                conflicts.add(frozenset((arrangement[seat], arrangement[other])))
+    return [tuple(sorted(pair)) for pair in conflicts]
+
+def find_seat_rule_problems(arrangement, seats, pre_assigned_seats, seat_constraints, layout_type, rows, cols):
+    """바뀐 자리만 확인해 사전 지정 자리와 자리 조건을 어긴 경우 찾기"""
+    problems = []
+    for seat in seats:
+        pinned = (pre_assigned_seats or {}).get(seat)
+        if pinned and arrangement.get(seat) != pinned:
+            problems.append(f"사전 지정: {pinned} 학생이 지정된 {seat + 1}번 자리에서 옮겨졌습니다.")
+        
+        student = arrangement.get(seat)
+        rules = (seat_constraints or {}).get(student)
+        if rules and not get_eligible_seats(rules, [seat], layout_type, rows, cols):
+            labels = ", ".join(SEAT_RULES[key][0] for key in rules)
+            problems.append(f"자리 조건: {student} 학생의 {seat + 1}번 자리가 조건({labels})에 맞지 않습니다.")
+    return problems
+
+def patch_seat_labels(fig, arrangement, seats, disabled_seats, selected_seat=None):
+    """자리 배치도 전체를 다시 그리지 않고 바뀐 자리의 이름/색만 수정
+    
+    자리 i의 사각형과 글자는 각각 fig.layout.shapes[i], fig.layout.annotations[i]이다.
+    """
+    for seat in seats:
+        student_name = arrangement.get(seat, "")
+        if seat in disabled_seats:
+            color, text_color = "lightgray", "gray"
+        elif student_name:
+            color, text_color = "lightblue", "black"
+        else:
+            color, text_color = "white", "gray"
+        fig.layout.shapes[seat].fillcolor = color
+        fig.layout.shapes[seat].line.color = "red" if seat == selected_seat else "black"
+        fig.layout.annotations[seat].text = f"{seat+1}<br>{student_name}"
+        fig.layout.annotations[seat].font.color = text_color
+
+def set_seating_arrangement(arrangement):
+    """자리 배치 전체 교체 (저장된 배치도와 자리 선택 초기화)"""
+    st.session_state.seating_arrangement = arrangement
+    st.session_state.seating_figure = None
+    st.session_state.swap_source = None
+
+def get_seating_figure():
+    """세션에 저장된 자리 배치도 (배치 형태나 보기가 바뀌면 다시 그림)"""
+    figure_key = (st.session_state.layout_type, st.session_state.rows, st.session_state.cols,
+                  st.session_state.is_teacher_view, tuple(sorted(st.session_state.disabled_seats)))
+    if (st.session_state.get('seating_figure') is None
+            or st.session_state.get('seating_figure_key') != figure_key):
+        st.session_state.seating_figure = create_seating_chart(
+            st.session_state.seating_arrangement,
+            st.session_state.layout_type,
+            st.session_state.rows,
+            st.session_state.cols,
+            st.session_state.is_teacher_view
+        )
+        st.session_state.seating_figure_key = figure_key
+        st.session_state.swap_source = None
+    return st.session_state.seating_figure
+
+def handle_seat_click(seat):
+    """자리 클릭 처리: 첫 클릭은 선택, 두 번째 클릭은 두 자리 바꾸기"""
+    fig = get_seating_figure()
+    arrangement = st.session_state.seating_arrangement
+    disabled_seats = st.session_state.disabled_seats
+    source = st.session_state.get('swap_source')
+    
+    if seat in disabled_seats:
+        st.warning(f"{seat + 1}번 자리는 비활성화된 자리입니다.")
+        return
+    
+    if source is None:
+        st.session_state.swap_source = seat
+        patch_seat_labels(fig, arrangement, [seat], disabled_seats, selected_seat=seat)
+        return
+    
+    st.session_state.swap_source = None
+    if source != seat:
+        swap_seats(arrangement, source, seat)
+        conflicts = find_distancing_conflicts(
+            arrangement, [source, seat], st.session_state.distanced_students,
+            st.session_state.layout_type, st.session_state.rows, st.session_state.cols
+        )
+        for student1, student2 in conflicts:
+            st.warning(f"자리 띄우기: {student1} 학생과 {student2} 학생이 너무 가깝습니다.")
+        for problem in find_seat_rule_problems(
+            arrangement, [source, seat], st.session_state.pre_assigned_seats,
+            st.session_state.seat_constraints,
+            st.session_state.layout_type, st.session_state.rows, st.session_state.cols
+        ):
+            st.warning(problem)
+    patch_seat_labels(fig, arrangement, [source, seat], disabled_seats)
+
+# 시드 탐색 점수 가중치 (점수가 낮을수록 좋은 배치)
+SEED_SCORE_WEIGHTS = {'violations': 100, 'repeats': 10, 'balance': 1}
+SEED_BALANCE_REGIONS = 4
+
+def get_neighbor_pairs(arrangement, layout_type, rows, cols):
+    """앞뒤/좌우/대각선으로 바로 붙어 앉은 학생 쌍 집합"""
+    by_coord = {get_seat_coordinates(seat, layout_type, rows, cols): student
+                for seat, student in arrangement.items()}
+    pairs = set()
+    for (row, col), student in by_coord.items():
+        for d_row, d_col in ((0, 1), (1, -1), (1, 0), (1, 1)):
+            neighbor = by_coord.get((row + d_row, col + d_col))
+            if neighbor:
+                pairs.add(frozenset((student, neighbor)))
+    return pairs
+
+def get_history_neighbor_pairs(history, store):
+    """히스토리 배치들에서 붙어 앉았던 학생 쌍 집합"""
+    pairs = set()
+    for entry in history:
+        layout_type, rows, cols = store[entry['layout']]
+        pairs |= get_neighbor_pairs(load_history_entry(entry, store), layout_type, rows, cols)
+    return frozenset(pairs)
+
+def score_arrangement(arrangement, layout_type, rows, cols, distanced_students=(),
+                      history_neighbor_pairs=frozenset(), regions=None):
+    """자리 배치 점수 계산 (자리 띄우기 위반, 과거 이웃 반복, 영역별 인원 균형)"""
+    distanced = set(distanced_students)
+    distanced_seats = [seat for seat, student in arrangement.items() if student in distanced]
+    violations = sum(1 for i, seat1 in enumerate(distanced_seats) for seat2 in distanced_seats[i + 1:]
+                     if is_too_close(seat1, seat2, layout_type, rows, cols))
+    
+    repeats = len(get_neighbor_pairs(arrangement, layout_type, rows, cols) & history_neighbor_pairs)
+    
+    # 영역별 학생 수의 표준편차 (빈 자리가 한쪽에 몰리지 않을수록 작음)
+    if regions is None:
+        regions = get_seat_regions(layout_type, rows, cols, SEED_BALANCE_REGIONS)
+    counts = [sum(1 for seat in region if seat in arrangement) for region in regions]
+    mean = sum(counts) / len(counts) if counts else 0
+    balance = (sum((count - mean) ** 2 for count in counts) / len(counts)) ** 0.5 if counts else 0.0
+    
+    components = {'violations': violations, 'repeats': repeats, 'balance': round(balance, 3)}
+    components['score'] = round(sum(SEED_SCORE_WEIGHTS[key] * value for key, value in components.items()), 3)
+    return components
+
+def score_seed_batch(seeds, config, history_neighbor_pairs=frozenset(), top_k=None):
+    """시드 묶음을 배치하고 채점 (시드 탐색 작업 프로세스에서 실행)"""
+    regions = get_seat_regions(config['layout_type'], config['rows'], config['cols'], SEED_BALANCE_REGIONS,
+                               tuple(sorted(config.get('disabled_seats', ()))))
+    results = []
+    for seed in seeds:
+        try:
+            arrangement = build_arrangement(seed=seed, **config)
+        except ValueError:
+            continue
+        result = score_arrangement(arrangement, config['layout_type'], config['rows'], config['cols'],
+                                   config.get('distanced_students', ()), history_neighbor_pairs, regions)
+        result['seed'] = seed
+        results.append(result)
+    if top_k is not None:
+        results = heapq.nsmallest(top_k, results, key=lambda result: (result['score'], result['seed']))
+    return results
+
+@st.cache_resource(show_spinner=False)
+def get_explorer_pool():
+    """시드 탐색용 프로세스 풀 (서버 프로세스에서 한 번 만들어 모든 세션이 공유, 단일 코어면 None)"""
+    if (os.cpu_count() or 1) < 2:
+        return None
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+def explore_seeds(config, seeds, top_k=5, history_neighbor_pairs=frozenset(), executor=None):
+    """여러 시드로 배치를 만들어 점수가 가장 좋은 top_k개 반환 (executor가 있으면 병렬)"""
+    seeds = list(seeds)
+    if executor is None:
+        return score_seed_batch(seeds, config, history_neighbor_pairs, top_k)
+    
+    # 작업 프로세스마다 여러 묶음을 받도록 나누고, 묶음별 상위 결과만 돌려받음
+    chunk_size = max(1, -(-len(seeds) // ((os.cpu_count() or 1) * 4)))
+    futures = [executor.submit(score_seed_batch, seeds[i:i + chunk_size], config,
+                               history_neighbor_pairs, top_k)
+               for i in range(0, len(seeds), chunk_size)]
+    results = [result for future in futures for result in future.result()]
+    return heapq.nsmallest(top_k, results, key=lambda result: (result['score'], result['seed']))
+
+def get_session_build_config(show_notice=False):
+    """세션 상태의 설정을 build_arrangement 인자로 모으기 (시드 제외)"""
+    algorithm = getattr(st.session_state, 'algorithm', '기본')
+    partner_counts = None
+    if algorithm == "짝꿍 최적화":
+        if show_notice and st.session_state.layout_type != "pairs":
+            st.info("짝꿍 최적화는 짝꿍 (분단형) 배치에서만 동작하여 기본 알고리즘으로 배치합니다.")
+        # 히스토리에서 과거 짝 횟수 계산
+        partner_counts = get_desk_partner_counts(
+            st.session_state.get('seating_history', []), st.session_state.get('snapshot_store', {})
         )
     
-    st.session_state.seating_arrangement = final_arrangement
+    return {
+        'students': st.session_state.students,
+        'layout_type': st.session_state.layout_type,
+        'rows': st.session_state.rows,
+        'cols': st.session_state.cols,
+        'disabled_seats': st.session_state.disabled_seats,
+        'pre_assigned_seats': st.session_state.pre_assigned_seats,
+        'distanced_students': st.session_state.distanced_students,
+        'seat_constraints': st.session_state.seat_constraints,
+        'group_count': getattr(st.session_state, 'group_count', 4),
+        'algorithm': algorithm,
+        'partner_counts': partner_counts
+    }
+
+def get_validation_config(build_config):
+    """build_arrangement 인자에서 validate_arrangement에 필요한 교실 설정만 고르기"""
+    return {key: build_config[key] for key in (
+        'students', 'layout_type', 'rows', 'cols', 'disabled_seats',
+        'pre_assigned_seats', 'distanced_students', 'seat_constraints'
+    )}
+
+def generate_seating_arrangement():
+    """자리 배치 생성"""
+    # 랜덤 시드 설정
+    random_seed = getattr(st.session_state, 'random_seed', 42)
+    np.random.seed(random_seed)
+    
+    config = get_session_build_config(show_notice=True)
+    try:
+        final_arrangement = build_arrangement(seed=random_seed, **config)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    
+    # 자리 띄우기를 모두 지키지 못한 경우 등은 배치는 보여 주되 알림
+    problems = validate_arrangement(final_arrangement, **get_validation_config(config))
+    if problems:
+        st.warning("배치가 일부 조건을 지키지 못했습니다: " + " ".join(problems))
+    
+    set_seating_arrangement(final_arrangement)
     
     # 자동 히스토리 저장
     auto_save = getattr(st.session_state, 'auto_save', True)
@@ -346,23 +918,314 @@ def generate_seating_arrangement():
     
     st.success("자리 배치가 완료되었습니다!")
 
+def validate_arrangement(arrangement, students, layout_type, rows, cols, disabled_seats=(),
+                         pre_assigned_seats=None, distanced_students=(), seat_constraints=None):
+    """자리 배치가 설정을 지키는지 검사하고 문제 목록 반환"""
+    problems = []
+    total_seats = get_total_seats(layout_type, rows, cols)
+    disabled_seats = set(disabled_seats)
+    roster = set(students)
+    
+    seen = set()
+    for seat, student in sorted(arrangement.items()):
+        if not 0 <= seat < total_seats:
+            problems.append(f"{seat + 1}번 자리는 교실에 없는 자리입니다.")
+        elif seat in disabled_seats:
+            problems.append(f"{seat + 1}번 자리는 비활성화된 자리입니다.")
+        if student not in roster:
+            problems.append(f"{student} 학생은 명단에 없습니다.")
+        elif student in seen:
+            problems.append(f"{student} 학생이 여러 자리에 배치되었습니다.")
+        seen.add(student)
+    
+    for student in students:
+        if student not in seen:
+            problems.append(f"{student} 학생의 자리가 없습니다.")
+    
+    for seat, student in (pre_assigned_seats or {}).items():
+        if arrangement.get(seat) != student:
+            problems.append(f"{student} 학생이 지정된 {seat + 1}번 자리에 있지 않습니다.")
+    
+    for seat, student in arrangement.items():
+        rules = (seat_constraints or {}).get(student)
+        if rules and not get_eligible_seats(rules, [seat], layout_type, rows, cols):
+            labels = ", ".join(SEAT_RULES[key][0] for key in rules)
+            problems.append(f"{student} 학생의 {seat + 1}번 자리가 자리 조건({labels})에 맞지 않습니다.")
+    
+    distanced = set(distanced_students)
+    distanced_seats = sorted(seat for seat, student in arrangement.items() if student in distanced)
+    for i, seat1 in enumerate(distanced_seats):
+        for seat2 in distanced_seats[i + 1:]:
+            if is_too_close(seat1, seat2, layout_type, rows, cols):
+                problems.append(f"{arrangement[seat1]} 학생과 {arrangement[seat2]} 학생이 너무 가깝습니다.")
+    
+    return problems
+
+# 균등 샘플링: 조건을 모두 지키는 배치 중에서 (근사적으로) 고르게 뽑는 마르코프 연쇄
+# sweep = 자유 자리 수만큼의 교환 제안
+MCMC_BURN_IN_SWEEPS = 50
+MCMC_THIN_SWEEPS = 2
+MCMC_REPAIR_SWEEPS = 500
+MCMC_REPAIR_TEMPERATURE = 0.5
+
+class SeatSwapChain:
+    """자유 자리 두 곳의 학생(또는 빈 자리)을 맞바꾸는 마르코프 연쇄
+    
+    교환할 두 자리를 고르게 고르는 대칭 제안이고 조건을 어기는 상태는 거절하므로,
+    정상 분포는 조건을 지키는 배치 위의 균등 분포다. 조건 검사는 바뀐 두 자리와
+    그 이웃만 본다.
+    """
+    
+    def __init__(self, arrangement, free_seats, layout_type, rows, cols, distanced_students=(),
+                 seat_constraints=None, rng=random):
+        geometry = get_layout_geometry(layout_type, rows, cols)
+        self.coords = geometry['coords']
+        self.neighbors = geometry['neighbors']
+        self.occupant = [None] * geometry['total_seats']
+        for seat, student in arrangement.items():
+            self.occupant[seat] = student
+        self.free_seats = list(free_seats)
+        self.free = set(self.free_seats)
+        self.distanced = set(distanced_students)
+        self.eligible = {
+            student: frozenset(get_eligible_seats(rules, range(geometry['total_seats']), layout_type, rows, cols))
+            for student, rules in (seat_constraints or {}).items() if rules
+        }
+        self.rng = rng
+        # 같은 자리나 빈 자리끼리 고른 제안은 상태가 그대로이므로 수락률에서 따로 셈
+        self.proposed = 0
+        self.accepted = 0
+        self.noop = 0
+    
+    def local_violations(self, seat):
+        """자리에 앉은 학생의 조건 위반 수 (자리 조건 + 가까운 자리 띄우기 학생 수)"""
+        student = self.occupant[seat]
+        if student is None:
+            return 0
+        count = 0
+        eligible = self.eligible.get(student)
+        if eligible is not None and seat not in eligible:
+            count += 1
+        if student in self.distanced:
+            for other in self.neighbors[seat]:
+                if self.occupant[other] in self.distanced:
+                    count += 1
+        return count
+    
+    def violations(self):
+        """자유 자리가 관련된 조건 위반 수 (고정된 자리끼리의 위반은 바꿀 수 없으므로 제외)"""
+        count = 0
+        for seat in self.free_seats:
+            student = self.occupant[seat]
+            if student is None:
+                continue
+            eligible = self.eligible.get(student)
+            if eligible is not None and seat not in eligible:
+                count += 1
+            if student in self.distanced:
+                for other in self.neighbors[seat]:
+                    # 자유 자리끼리의 쌍은 한 번만 셈
+                    if self.occupant[other] in self.distanced and (other not in self.free or other > seat):
+                        count += 1
+        return count
+    
+    def step(self, temperature=0.0):
+        """교환 한 번 제안 (위반이 늘지 않으면 수락, temperature > 0이면 늘어도 확률적으로 수락)
+        
+        두 자리의 쌍 자체는 교환해도 그대로이므로 위반 수 변화는 두 자리의
+        local_violations 변화와 같다.
+        """
+        seat1 = self.free_seats[self.rng.randrange(len(self.free_seats))]
+        seat2 = self.free_seats[self.rng.randrange(len(self.free_seats))]
+        self.proposed += 1
+        occupant = self.occupant
+        if occupant[seat1] == occupant[seat2]:
+            # 같은 자리 또는 빈 자리끼리는 상태가 그대로
+            self.noop += 1
+            return 0
+        
+        before = self.local_violations(seat1) + self.local_violations(seat2)
+        occupant[seat1], occupant[seat2] = occupant[seat2], occupant[seat1]
+        delta = self.local_violations(seat1) + self.local_violations(seat2) - before
+        if delta <= 0 or (temperature > 0 and self.rng.random() < np.exp(-delta / temperature)):
+            self.accepted += 1
+            return delta
+        occupant[seat1], occupant[seat2] = occupant[seat2], occupant[seat1]
+        return 0
+    
+    def sweep(self, count=1):
+        for _ in range(count * len(self.free_seats)):
+            self.step()
+    
+    def repair(self, max_sweeps=MCMC_REPAIR_SWEEPS):
+        """시작 배치의 조건 위반을 없애기 (실패하면 ValueError)"""
+        violations = self.violations()
+        steps = 0
+        while violations > 0:
+            if steps >= max_sweeps * len(self.free_seats):
+                raise ValueError("자리 띄우기와 자리 조건을 모두 지키는 배치를 찾지 못했습니다.")
+            violations += self.step(MCMC_REPAIR_TEMPERATURE)
+            steps += 1
+        # 수리 단계의 제안은 수락률 통계에서 제외
+        self.proposed = 0
+        self.accepted = 0
+        self.noop = 0
+    
+    def get_arrangement(self):
+        return {seat: student for seat, student in enumerate(self.occupant) if student is not None}
+
+def create_swap_chain(students, layout_type, rows, cols, disabled_seats=(), pre_assigned_seats=None,
+                      distanced_students=(), seat_constraints=None, seed=42,
+                      burn_in_sweeps=MCMC_BURN_IN_SWEEPS):
+    """기본 알고리즘 배치에서 시작해 수리와 burn-in을 마친 마르코프 연쇄 만들기"""
+    pre_assigned_seats = pre_assigned_seats or {}
+    total_seats = get_total_seats(layout_type, rows, cols)
+    # 연쇄는 자리 인덱스로 배열을 쓰므로 교실 밖 사전 지정 자리는 미리 거절
+    for seat in sorted(pre_assigned_seats):
+        if not 0 <= seat < total_seats:
+            raise ValueError(f"사전 지정된 {seat + 1}번 자리는 교실에 없는 자리입니다. 교실 배열을 확인해주세요.")
+    start = build_arrangement(students, layout_type, rows, cols, disabled_seats, pre_assigned_seats,
+                              distanced_students, seed=seed, seat_constraints=seat_constraints)
+    disabled_seats = set(disabled_seats)
+    free_seats = [i for i in range(total_seats)
+                  if i not in disabled_seats and i not in pre_assigned_seats]
+    pre_assigned_students = set(pre_assigned_seats.values())
+    constrained = {student: rules for student, rules in (seat_constraints or {}).items()
+                   if student in students and student not in pre_assigned_students}
+    
+    chain = SeatSwapChain(start, free_seats, layout_type, rows, cols, distanced_students,
+                          constrained, random.Random(seed))
+    chain.repair()
+    chain.sweep(burn_in_sweeps)
+    return chain
+
+def run_sampler_chain(config, seed, samples_per_chain, burn_in_sweeps=MCMC_BURN_IN_SWEEPS,
+                      thin_sweeps=MCMC_THIN_SWEEPS):
+    """연쇄 하나에서 표본 뽑기 (작업 프로세스에서도 실행)"""
+    started = time.perf_counter()
+    chain = create_swap_chain(seed=seed, burn_in_sweeps=burn_in_sweeps, **config)
+    samples = []
+    for _ in range(samples_per_chain):
+        chain.sweep(thin_sweeps)
+        samples.append(chain.get_arrangement())
+    return {
+        'samples': samples,
+        'proposed': chain.proposed,
+        'accepted': chain.accepted,
+        'noop': chain.noop,
+        'elapsed': time.perf_counter() - started,
+    }
+
+def gelman_rubin(values):
+    """연쇄별 표본 값 (연쇄 수 × 표본 수)의 R-hat (1에 가까울수록 잘 섞임)"""
+    chain_count, sample_count = values.shape
+    within = values.var(axis=1, ddof=1).mean()
+    if chain_count < 2 or within == 0:
+        return float("nan")
+    between = sample_count * values.mean(axis=1).var(ddof=1)
+    pooled = (sample_count - 1) / sample_count * within + between / sample_count
+    return float(np.sqrt(pooled / within))
+
+def effective_sample_size(values):
+    """연쇄별 표본 값의 유효 표본 수 (자기상관을 Geyer 방식으로 잘라 합산)"""
+    chain_count, sample_count = values.shape
+    centered = values - values.mean(axis=1, keepdims=True)
+    variance = (centered ** 2).mean()
+    if variance == 0:
+        return float("nan")
+    # 자기공분산을 FFT로 한 번에 계산 (0을 덧대어 순환 상관 방지)
+    spectrum = np.fft.rfft(centered, n=2 * sample_count, axis=1)
+    autocovariance = np.fft.irfft(spectrum * np.conj(spectrum), axis=1)[:, :sample_count].sum(axis=0)
+    autocorrelation = autocovariance / (chain_count * sample_count * variance)
+    total = -1.0
+    for lag in range(0, sample_count - 1, 2):
+        pair_sum = autocorrelation[lag] + autocorrelation[lag + 1]
+        if pair_sum < 0:
+            break
+        total += 2 * pair_sum
+    return float(chain_count * sample_count / max(total, 1e-12))
+
+def sample_arrangements(config, samples_per_chain=200, chains=4, seed=42,
+                        burn_in_sweeps=MCMC_BURN_IN_SWEEPS, thin_sweeps=MCMC_THIN_SWEEPS, executor=None):
+    """조건을 지키는 배치를 여러 연쇄로 균등 샘플링하고 (표본 목록, 진단 결과) 반환
+    
+    config는 build_arrangement의 교실 설정 인자(students, layout_type, rows, cols,
+    disabled_seats, pre_assigned_seats, distanced_students, seat_constraints)이다.
+    진단 통계는 학생별 앉은 행 번호로 계산한다.
+    """
+    started = time.perf_counter()
+    seeds = [seed + chain for chain in range(chains)]
+    if executor is None:
+        results = [run_sampler_chain(config, chain_seed, samples_per_chain, burn_in_sweeps, thin_sweeps)
+                   for chain_seed in seeds]
+    else:
+        futures = [executor.submit(run_sampler_chain, config, chain_seed, samples_per_chain,
+                                   burn_in_sweeps, thin_sweeps)
+                   for chain_seed in seeds]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    
+    coords = get_layout_geometry(config['layout_type'], config['rows'], config['cols'])['coords']
+    students = list(config['students'])
+    student_numbers = {student: i for i, student in enumerate(students)}
+    student_rows = np.zeros((len(students), chains, samples_per_chain))
+    for c, result in enumerate(results):
+        for s, sample in enumerate(result['samples']):
+            for seat, student in sample.items():
+                student_rows[student_numbers[student], c, s] = coords[seat][0]
+    
+    # 자리가 바뀌지 않는 학생(사전 지정 등)은 R-hat/ESS 계산에서 제외
+    r_hats, sizes = [], []
+    for values in student_rows:
+        if values.var() > 0:
+            r_hats.append(gelman_rubin(values))
+            sizes.append(effective_sample_size(values))
+    
+    proposed = sum(result['proposed'] for result in results)
+    accepted = sum(result['accepted'] for result in results)
+    noop = sum(result['noop'] for result in results)
+    
+    def get_acceptance_rate(accepted, proposed, noop):
+        # 상태가 바뀌는 제안(no-op 제외) 중 수락된 비율
+        moves = proposed - noop
+        return accepted / moves if moves else 0.0
+    
+    sample_count = chains * samples_per_chain
+    diagnostics = {
+        'chains': chains,
+        'samples': sample_count,
+        'acceptance_rate': get_acceptance_rate(accepted, proposed, noop),
+        'chain_acceptance_rates': [get_acceptance_rate(result['accepted'], result['proposed'], result['noop'])
+                                   for result in results],
+        'noop_rate': noop / proposed if proposed else 0.0,
+        'r_hat': max(r_hats) if r_hats else float("nan"),
+        'ess': min(sizes) if sizes else float("nan"),
+        'mean_rows': {student: float(student_rows[i].mean()) + 1 for i, student in enumerate(students)},
+        'elapsed': elapsed,
+        'samples_per_second': sample_count / elapsed if elapsed else 0.0,
+        'proposals_per_second': proposed / elapsed if elapsed else 0.0,
+    }
+    return [sample for result in results for sample in result['samples']], diagnostics
+
 def generate_default_arrangement(final_arrangement, distanced_students, regular_students, 
-                               available_seats, layout_type, rows, cols):
+                               available_seats, layout_type, rows, cols, rng=random,
+                               placed_distanced_seats=()):
     """기본 자리 배치 알고리즘"""
     # 자리 띄우기 학생들 배치
-    placed_distanced_indices = []
+    # 이미 앉은 자리 띄우기 학생(사전 지정, 자리 조건)의 자리부터 피함
+    placed_distanced_indices = list(placed_distanced_seats)
     unplaced_distanced = []
     
     if distanced_students:
         available_for_distanced = [i for i in available_seats 
                                  if i not in final_arrangement]
-        random.shuffle(available_for_distanced)
+        rng.shuffle(available_for_distanced)
+        close_seats = get_layout_geometry(layout_type, rows, cols)['neighbors']
         
         for student in distanced_students:
             placed = False
             for i, seat_index in enumerate(available_for_distanced):
-                is_close_to_other = any(is_too_close(seat_index, placed_idx, 
-                                                   layout_type, rows, cols) 
+                is_close_to_other = any(placed_idx in close_seats[seat_index] 
                                       for placed_idx in placed_distanced_indices)
                 
                 if not is_close_to_other:
@@ -379,7 +1242,7 @@ def generate_default_arrangement(final_arrangement, distanced_students, regular_
     regular_students.extend(unplaced_distanced)
     
     # 일반 학생들 배치
-    random.shuffle(regular_students)
+    rng.shuffle(regular_students)
     remaining_seats = [i for i in available_seats if i not in final_arrangement]
     
     for i, student in enumerate(regular_students):
@@ -389,22 +1252,24 @@ def generate_default_arrangement(final_arrangement, distanced_students, regular_
     return final_arrangement
 
 def generate_balanced_arrangement(final_arrangement, distanced_students, regular_students, 
-                                available_seats, layout_type, rows, cols):
+                                available_seats, layout_type, rows, cols, rng=random,
+                                placed_distanced_seats=()):
     """균형 자리 배치 알고리즘 (앞뒤, 좌우 균형 고려)"""
     # 자리 띄우기 학생들 먼저 배치
-    placed_distanced_indices = []
+    # 이미 앉은 자리 띄우기 학생(사전 지정, 자리 조건)의 자리부터 피함
+    placed_distanced_indices = list(placed_distanced_seats)
     unplaced_distanced = []
     
     if distanced_students:
         available_for_distanced = [i for i in available_seats 
                                  if i not in final_arrangement]
-        random.shuffle(available_for_distanced)
+        rng.shuffle(available_for_distanced)
+        close_seats = get_layout_geometry(layout_type, rows, cols)['neighbors']
         
         for student in distanced_students:
             placed = False
             for i, seat_index in enumerate(available_for_distanced):
-                is_close_to_other = any(is_too_close(seat_index, placed_idx, 
-                                                   layout_type, rows, cols) 
+                is_close_to_other = any(placed_idx in close_seats[seat_index] 
                                       for placed_idx in placed_distanced_indices)
                 
                 if not is_close_to_other:
@@ -434,30 +1299,92 @@ def generate_balanced_arrangement(final_arrangement, distanced_students, regular
     sorted_seats = sorted(remaining_seats, key=lambda x: seat_weights[x])
     
     # 학생들을 균형있게 배치
-    random.shuffle(regular_students)
+    rng.shuffle(regular_students)
     for i, student in enumerate(regular_students):
         if i < len(sorted_seats):
             final_arrangement[sorted_seats[i]] = student
     
     return final_arrangement
 
+# 그룹 분산: 자리 좌표를 k개 영역으로 나누는 균형 클러스터링 반복 횟수
+REGION_CLUSTER_ITERATIONS = 20
+
+# st.cache_resource: 스크립트가 다시 실행되어도 유지되고 모든 세션이 공유하는 캐시
+@st.cache_resource(max_entries=128, show_spinner=False)
+def get_seat_regions(layout_type, rows, cols, region_count, disabled_seats=()):
+    """자리 좌표를 크기가 같은 region_count개의 공간 영역으로 나누기 (배치 형태별 캐시)
+    
+    가장 먼 점 순서로 중심을 잡은 뒤, 자리-중심 거리가 가까운 순서대로 정원
+    (⌈n/k⌉ 또는 ⌊n/k⌋)이 남은 영역에 배정하고 중심을 다시 계산하는 과정을
+    반복한다. 영역은 중심 좌표 순(앞줄·왼쪽부터)으로 정렬된 자리 튜플의 튜플이다.
+    """
+    disabled = set(disabled_seats)
+    seats = [i for i in range(get_total_seats(layout_type, rows, cols)) if i not in disabled]
+    region_count = max(1, min(region_count, len(seats)))
+    if not seats:
+        return ()
+    coords = {seat: get_seat_coordinates(seat, layout_type, rows, cols) for seat in seats}
+    
+    def distance(seat, center):
+        row, col = coords[seat]
+        return (row - center[0]) ** 2 + (col - center[1]) ** 2
+    
+    # 가장 먼 점 순서로 초기 중심 선택
+    centers = [coords[seats[0]]]
+    while len(centers) < region_count:
+        farthest = max(seats, key=lambda seat: min(distance(seat, center) for center in centers))
+        centers.append(coords[farthest])
+    
+    capacities = [len(seats) // region_count + (1 if r < len(seats) % region_count else 0)
+                  for r in range(region_count)]
+    assignment = None
+    for _ in range(REGION_CLUSTER_ITERATIONS):
+        candidates = sorted((distance(seat, center), seat, r)
+                            for seat in seats for r, center in enumerate(centers))
+        new_assignment = {}
+        counts = [0] * region_count
+        for _, seat, r in candidates:
+            if seat not in new_assignment and counts[r] < capacities[r]:
+                new_assignment[seat] = r
+                counts[r] += 1
+        if new_assignment == assignment:
+            break
+        assignment = new_assignment
+        for r in range(region_count):
+            members = [coords[seat] for seat, region in assignment.items() if region == r]
+            centers[r] = (sum(row for row, _ in members) / len(members),
+                          sum(col for _, col in members) / len(members))
+    
+    regions = [[] for _ in range(region_count)]
+    for seat in seats:
+        regions[assignment[seat]].append(seat)
+    order = sorted(range(region_count), key=lambda r: centers[r])
+    return tuple(tuple(regions[r]) for r in order)
+
 def generate_group_distributed_arrangement(final_arrangement, distanced_students, regular_students, 
-                                         available_seats, layout_type, rows, cols):
-    """그룹 분산 자리 배치 알고리즘 (학생들을 여러 그룹으로 나누어 분산 배치)"""
+                                         available_seats, layout_type, rows, cols, rng=random,
+                                         group_count=4, placed_distanced_seats=()):
+    """그룹 분산 자리 배치 알고리즘 (학생들을 여러 그룹으로 나누어 교실의 서로 다른 영역에 배치)"""
+    # 비활성화된 자리 (사용 가능하지도, 사전 지정되지도 않은 자리)
+    available_set = set(available_seats)
+    disabled_seats = tuple(i for i in range(get_total_seats(layout_type, rows, cols))
+                           if i not in available_set and i not in final_arrangement)
+    
     # 자리 띄우기 학생들 먼저 배치
-    placed_distanced_indices = []
+    # 이미 앉은 자리 띄우기 학생(사전 지정, 자리 조건)의 자리부터 피함
+    placed_distanced_indices = list(placed_distanced_seats)
     unplaced_distanced = []
     
     if distanced_students:
         available_for_distanced = [i for i in available_seats 
                                  if i not in final_arrangement]
-        random.shuffle(available_for_distanced)
+        rng.shuffle(available_for_distanced)
+        close_seats = get_layout_geometry(layout_type, rows, cols)['neighbors']
         
         for student in distanced_students:
             placed = False
             for i, seat_index in enumerate(available_for_distanced):
-                is_close_to_other = any(is_too_close(seat_index, placed_idx, 
-                                                   layout_type, rows, cols) 
+                is_close_to_other = any(placed_idx in close_seats[seat_index] 
                                       for placed_idx in placed_distanced_indices)
                 
                 if not is_close_to_other:
@@ -472,49 +1399,399 @@ def generate_group_distributed_arrangement(final_arrangement, distanced_students
     
     regular_students.extend(unplaced_distanced)
     
-    # 학생들을 그룹으로 나누기
-    group_size = max(1, len(regular_students) // 4)  # 4개 그룹으로 나누기
-    groups = [regular_students[i:i + group_size] for i in range(0, len(regular_students), group_size)]
-    
-    remaining_seats = [i for i in available_seats if i not in final_arrangement]
-    
-    # 각 그룹을 다른 영역에 배치
-    seats_per_group = len(remaining_seats) // len(groups) if groups else 0
+    # 학생들을 명단 순서대로 group_count개 그룹으로 나누기 (그룹 크기 차이는 최대 1명)
+    regions = get_seat_regions(layout_type, rows, cols, group_count, disabled_seats)
+    group_count = max(1, len(regions))
+    group_sizes = [len(regular_students) // group_count + (1 if g < len(regular_students) % group_count else 0)
+                   for g in range(group_count)]
+    groups = []
+    start = 0
+    for size in group_sizes:
+        groups.append(regular_students[start:start + size])
+        start += size
     
-    for group_idx, group in enumerate(groups):
-        start_idx = group_idx * seats_per_group
-        end_idx = start_idx + seats_per_group if group_idx < len(groups) - 1 else len(remaining_seats)
-        group_seats = remaining_seats[start_idx:end_idx]
-        
-        random.shuffle(group)
+    # 각 그룹을 해당 영역의 빈 자리에 배치
+    overflow = []
+    for group, region in zip(groups, regions):
+        group_seats = [i for i in region if i not in final_arrangement]
+        rng.shuffle(group)
+        rng.shuffle(group_seats)
         for i, student in enumerate(group):
             if i < len(group_seats):
                 final_arrangement[group_seats[i]] = student
+            else:
+                overflow.append((student, region))
+    
+    # 영역이 가득 찬 학생은 그 영역 중심에 가장 가까운 빈 자리로
+    remaining_seats = [i for i in available_seats if i not in final_arrangement]
+    for student, region in overflow:
+        region_coords = [get_seat_coordinates(i, layout_type, rows, cols) for i in region]
+        center = (sum(row for row, _ in region_coords) / len(region_coords),
+                  sum(col for _, col in region_coords) / len(region_coords))
+        
+        def distance_to_center(seat):
+            row, col = get_seat_coordinates(seat, layout_type, rows, cols)
+            return (row - center[0]) ** 2 + (col - center[1]) ** 2
+        
+        seat = min(remaining_seats, key=distance_to_center)
+        remaining_seats.remove(seat)
+        final_arrangement[seat] = student
+    
+    return final_arrangement
+
+# 짝꿍 최적화 가중치: 짝이 되면 기본 점수, 과거에 짝이었던 횟수만큼 감점
+PAIR_BASE_WEIGHT = 1000
+PAST_PARTNER_PENALTY = 100
+PAIR_RANDOM_JITTER = 10
+
+def get_desk_partner_counts(history, store):
+    """히스토리의 분단형 배치에서 학생 쌍별로 짝이었던 횟수 계산"""
+    partner_counts = {}
+    for entry in history:
+        layout_type, _, _ = store[entry['layout']]
+        if layout_type != "pairs":
+            continue
+        roster = store[entry['roster']]
+        seat_ids = get_history_student_ids(store, entry)
+        for left in range(0, len(seat_ids) - 1, 2):
+            left_id, right_id = seat_ids[left], seat_ids[left + 1]
+            if left_id and right_id:
+                pair = frozenset((roster[left_id - 1], roster[right_id - 1]))
+                partner_counts[pair] = partner_counts.get(pair, 0) + 1
+    return partner_counts
+
+def generate_pair_matched_arrangement(final_arrangement, distanced_students, regular_students,
+                                      available_seats, layout_type, rows, cols, rng=random,
+                                      partner_counts=None, placed_distanced_seats=()):
+    """짝꿍 최적화 자리 배치 알고리즘 (분단형 전용)
+    
+    과거에 짝이었던 횟수가 적을수록 점수가 높은 학생×학생 가중치로 최대 가중치
+    매칭을 풀어 짝을 먼저 정하고, 정해진 짝을 빈 책상(2k, 2k+1번 자리)에 배치한다.
+    자리 띄우기 학생끼리는 짝이 되지 않으며, 자리 띄우기 학생이 앉는 자리가 서로
+    떨어지도록 책상과 방향을 고른다.
+    """
+    if layout_type != "pairs":
+        return generate_default_arrangement(
+            final_arrangement, distanced_students, regular_students,
+            available_seats, layout_type, rows, cols, rng, placed_distanced_seats
+        )
+    
+    partner_counts = partner_counts or {}
+    students = list(distanced_students) + list(regular_students)
+    distanced = set(distanced_students)
+    
+    # 학생×학생 가중치 그래프 (자리 띄우기 학생끼리는 간선 없음)
+    graph = nx.Graph()
+    for i in range(len(students)):
+        for j in range(i + 1, len(students)):
+            if students[i] in distanced and students[j] in distanced:
+                continue
+            penalty = PAST_PARTNER_PENALTY * partner_counts.get(frozenset((students[i], students[j])), 0)
+            weight = max(1, PAIR_BASE_WEIGHT - penalty) + rng.randrange(PAIR_RANDOM_JITTER)
+            graph.add_edge(i, j, weight=weight)
+    
+    # 짝의 수가 최대인 매칭 중 가중치 합이 최대인 매칭 (Edmonds 블로섬 알고리즘)
+    matching = nx.max_weight_matching(graph, maxcardinality=True)
+    pairs = sorted((tuple(sorted(pair)) for pair in matching),
+                   key=lambda pair: (-graph.edges[pair]['weight'], pair))
+    
+    # 두 자리가 모두 빈 책상과 한 자리만 빈 책상 구분
+    free_seats = set(i for i in available_seats if i not in final_arrangement)
+    full_desks = []
+    half_desk_seats = []
+    for left in range(0, get_total_seats(layout_type, rows, cols), 2):
+        desk = [seat for seat in (left, left + 1) if seat in free_seats]
+        if len(desk) == 2:
+            full_desks.append(desk)
+        elif desk:
+            half_desk_seats.extend(desk)
+    rng.shuffle(full_desks)
+    rng.shuffle(half_desk_seats)
+    
+    # 빈 책상보다 짝이 많으면 점수가 낮은 짝부터 혼자 앉힘
+    paired = set()
+    for i, j in pairs[:len(full_desks)]:
+        paired.update((i, j))
+    singles = [students[i] for i in range(len(students)) if i not in paired]
+    pairs = [[students[i], students[j]] for i, j in pairs[:len(full_desks)]]
+    
+    placed_distanced_indices = list(placed_distanced_seats)
+    
+    close_seats = get_layout_geometry(layout_type, rows, cols)['neighbors']
+    
+    def count_close_distanced(seat):
+        return sum(1 for placed_idx in placed_distanced_indices if placed_idx in close_seats[seat])
+    
+    # 혼자 앉는 자리 띄우기 학생부터 한 자리만 빈 책상(짝에게 남는 책상이 있으면 그 자리도)에서
+    # 가까운 자리 띄우기 학생이 가장 적은 자리에 배치
+    spare_desks = len(full_desks) - len(pairs)
+    for student in [student for student in singles if student in distanced]:
+        candidates = list(half_desk_seats)
+        if spare_desks:
+            candidates += [seat for desk in full_desks for seat in desk]
+        seat = min(candidates, key=count_close_distanced)
+        if seat in half_desk_seats:
+            half_desk_seats.remove(seat)
+        else:
+            desk = next(desk for desk in full_desks if seat in desk)
+            full_desks.remove(desk)
+            half_desk_seats.append(desk[0] if desk[1] == seat else desk[1])
+            spare_desks -= 1
+        final_arrangement[seat] = student
+        placed_distanced_indices.append(seat)
+    singles = [student for student in singles if student not in distanced]
+    
+    # 자리 띄우기 학생이 있는 짝부터 배치: 자리 띄우기 학생이 앉을 쪽 자리만 보고
+    # 가까운 자리 띄우기 학생이 없는 책상과 방향을 고름 (없으면 가장 적은 곳)
+    pairs.sort(key=lambda pair: not (pair[0] in distanced or pair[1] in distanced))
+    for pair in pairs:
+        if pair[1] in distanced:
+            pair.reverse()
+        # 책상 안 방향은 무작위 (자리 띄우기 학생은 가까운 학생이 없는 쪽을 우선)
+        desk_index, side = 0, rng.randrange(2)
+        if pair[0] in distanced:
+            best_conflicts = None
+            for k, desk in enumerate(full_desks):
+                for seat_side in (side, 1 - side):
+                    conflicts = count_close_distanced(desk[seat_side])
+                    if best_conflicts is None or conflicts < best_conflicts:
+                        desk_index, best_side, best_conflicts = k, seat_side, conflicts
+                if best_conflicts == 0:
+                    break
+            side = best_side
+        desk = full_desks.pop(desk_index)
+        final_arrangement[desk[side]] = pair[0]
+        final_arrangement[desk[1 - side]] = pair[1]
+        if pair[0] in distanced:
+            placed_distanced_indices.append(desk[side])
+    
+    # 남은 학생은 한 자리만 빈 책상부터 배치
+    remaining_seats = half_desk_seats + [seat for desk in full_desks for seat in desk]
+    for seat, student in zip(remaining_seats, singles):
+        final_arrangement[seat] = student
     
     return final_arrangement
 
+# 배치 코드 형식: 버전, 배치 유형, 행, 열, 명단 CRC32, 학생 수 (10바이트 헤더)
+ARRANGEMENT_CODE_VERSION = 1
+ARRANGEMENT_CODE_HEADER = struct.Struct(">BBBBIH")
+LAYOUT_TYPE_CODES = {"default": 0, "pairs": 1}
+# 배치 유형별 최대 행/열 수 (분단형은 분단 수와 분단별 행 수)
+LAYOUT_SIZE_LIMITS = {"default": 15, "pairs": 10}
+
+# 배치 알고리즘 목록과 그룹 분산 그룹 수 범위
+ALGORITHMS = ["기본", "균형 배치", "그룹 분산", "짝꿍 최적화", "균등 샘플링"]
+GROUP_COUNT_RANGE = (2, 8)
+
+def get_total_seats(layout_type, rows, cols):
+    """배치 유형별 총 자리 수 계산"""
+    if layout_type == "pairs":
+        return rows * cols * 2
+    return rows * cols
+
+def get_roster_checksum(students):
+    """명단 확인용 CRC32 값 계산"""
+    return zlib.crc32("\n".join(students).encode("utf-8"))
+
+def _b64url_encode(data):
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+def _b64url_decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def arrangement_to_student_ids(arrangement, students, total_seats):
+    """자리 배치를 자리별 명단 번호(빈 자리는 0) 튜플로 변환"""
+    student_ids = {}
+    for i, student in enumerate(students):
+        student_ids.setdefault(student, i + 1)
+    
+    seat_ids = []
+    for seat in range(total_seats):
+        student = arrangement.get(seat)
+        if student is None:
+            seat_ids.append(0)
+        elif student in student_ids:
+            seat_ids.append(student_ids[student])
+        else:
+            raise ValueError(f"명단에 없는 학생입니다: {student}")
+    return tuple(seat_ids)
+
+def student_ids_to_arrangement(seat_ids, students):
+    """자리별 명단 번호를 자리 배치로 변환"""
+    return {seat: students[student_id - 1] for seat, student_id in enumerate(seat_ids) if student_id}
+
+def pack_arrangement_code(seat_ids, layout_type, rows, cols, roster_checksum, student_count):
+    """자리별 명단 번호를 배치 코드로 비트 패킹"""
+    width = max(1, student_count.bit_length())
+    packed = 0
+    for student_id in seat_ids:
+        packed = (packed << width) | student_id
+    
+    try:
+        header = ARRANGEMENT_CODE_HEADER.pack(
+            ARRANGEMENT_CODE_VERSION, LAYOUT_TYPE_CODES[layout_type],
+            rows, cols, roster_checksum, student_count
+        )
+    except struct.error:
+        raise ValueError("배치 코드로 표현할 수 없는 교실 크기입니다.")
+    body = packed.to_bytes((len(seat_ids) * width + 7) // 8, "big")
+    return _b64url_encode(header + body)
+
+def unpack_arrangement_code(code):
+    """배치 코드를 (배치 유형, 행, 열, 명단 CRC, 학생 수, 자리별 명단 번호)로 분해"""
+    try:
+        data = _b64url_decode(code)
+        version, layout_code, rows, cols, checksum, student_count = \
+            ARRANGEMENT_CODE_HEADER.unpack_from(data)
+    except (ValueError, struct.error):
+        raise ValueError("잘못된 배치 코드입니다.")
+    
+    if version != ARRANGEMENT_CODE_VERSION:
+        raise ValueError(f"지원하지 않는 배치 코드 버전입니다: {version}")
+    layout_types = {code: name for name, code in LAYOUT_TYPE_CODES.items()}
+    if layout_code not in layout_types:
+        raise ValueError("잘못된 배치 코드입니다.")
+    
+    layout_type = layout_types[layout_code]
+    total_seats = get_total_seats(layout_type, rows, cols)
+    width = max(1, student_count.bit_length())
+    body = data[ARRANGEMENT_CODE_HEADER.size:]
+    if len(body) != (total_seats * width + 7) // 8:
+        raise ValueError("잘못된 배치 코드입니다.")
+    
+    packed = int.from_bytes(body, "big")
+    mask = (1 << width) - 1
+    seat_ids = tuple((packed >> ((total_seats - 1 - seat) * width)) & mask
+                     for seat in range(total_seats))
+    if any(student_id > student_count for student_id in seat_ids):
+        raise ValueError("잘못된 배치 코드입니다.")
+    return layout_type, rows, cols, checksum, student_count, seat_ids
+
+def encode_arrangement(arrangement, students, layout_type, rows, cols):
+    """자리 배치를 URL에 넣을 수 있는 짧은 코드로 변환
+    
+    각 자리에 앉은 학생의 명단 번호(빈 자리는 0)를 학생 수에 맞는 비트 수로
+    이어 붙이고, 배치 유형/크기/명단 CRC 헤더와 함께 base64url로 인코딩한다.
+    """
+    seat_ids = arrangement_to_student_ids(
+        arrangement, students, get_total_seats(layout_type, rows, cols)
+    )
+    return pack_arrangement_code(
+        seat_ids, layout_type, rows, cols, get_roster_checksum(students), len(students)
+    )
+
+def decode_arrangement(code, students):
+    """배치 코드를 (자리 배치, 배치 유형, 행, 열)로 복원"""
+    layout_type, rows, cols, checksum, student_count, seat_ids = unpack_arrangement_code(code)
+    if student_count != len(students) or checksum != get_roster_checksum(students):
+        raise ValueError("배치 코드의 명단이 현재 명단과 다릅니다.")
+    return student_ids_to_arrangement(seat_ids, students), layout_type, rows, cols
+
+def encode_roster(students):
+    """공유 링크용 명단 압축 인코딩"""
+    return _b64url_encode(zlib.compress("\n".join(students).encode("utf-8"), 9))
+
+def decode_roster(code):
+    """공유 링크의 명단 복원"""
+    try:
+        text = zlib.decompress(_b64url_decode(code)).decode("utf-8")
+    except (ValueError, zlib.error):
+        raise ValueError("잘못된 명단 코드입니다.")
+    return text.split("\n") if text else []
+
+# 히스토리 스냅샷 저장소: 명단/배치 형태/기준 배치 코드를 내용 해시로 한 번만 저장
+HISTORY_LIMIT = 20
+HISTORY_DELTA_RATIO = 0.25  # 기준 배치와 바뀐 자리가 이 비율 이하이면 차이만 저장
+
+def get_content_key(value):
+    """스냅샷 내용의 해시 키 계산"""
+    return hashlib.sha256(repr(value).encode("utf-8")).hexdigest()[:16]
+
+def put_snapshot(store, value):
+    """스냅샷을 내용 해시 키로 저장하고 키 반환 (같은 내용은 한 번만 저장)"""
+    key = get_content_key(value)
+    store.setdefault(key, value)
+    return key
+
+def prune_snapshot_store(store, history):
+    """히스토리에서 더 이상 참조하지 않는 스냅샷 삭제"""
+    referenced = set()
+    for entry in history:
+        referenced.update((entry['roster'], entry['layout'], entry['base']))
+    for key in [key for key in store if key not in referenced]:
+        del store[key]
+
+def make_history_entry(store, previous_entry, arrangement, students, layout_type, rows, cols, timestamp):
+    """히스토리 항목 생성
+    
+    명단과 배치 형태는 스냅샷 키로만 참조한다. 직전 항목과 명단/형태가 같고 그
+    기준 배치(base)와 바뀐 자리가 적으면 (자리, 명단 번호) 차이(delta)만 저장하고,
+    아니면 현재 배치를 새 기준 배치 코드로 저장한다.
+    """
+    total_seats = get_total_seats(layout_type, rows, cols)
+    seat_ids = arrangement_to_student_ids(arrangement, students, total_seats)
+    roster_key = put_snapshot(store, tuple(students))
+    layout_key = put_snapshot(store, (layout_type, rows, cols))
+    
+    if (previous_entry is not None
+            and previous_entry['roster'] == roster_key
+            and previous_entry['layout'] == layout_key):
+        base_ids = unpack_arrangement_code(store[previous_entry['base']])[-1]
+        delta = tuple((seat, student_id)
+                      for seat, (base_id, student_id) in enumerate(zip(base_ids, seat_ids))
+                      if base_id != student_id)
+        if len(delta) <= total_seats * HISTORY_DELTA_RATIO:
+            return {'timestamp': timestamp, 'roster': roster_key, 'layout': layout_key,
+                    'base': previous_entry['base'], 'delta': delta}
+    
+    code = pack_arrangement_code(
+        seat_ids, layout_type, rows, cols, get_roster_checksum(students), len(students)
+    )
+    return {'timestamp': timestamp, 'roster': roster_key, 'layout': layout_key,
+            'base': put_snapshot(store, code), 'delta': ()}
+
+def get_history_student_ids(store, history_entry):
+    """히스토리 항목의 자리별 명단 번호 복원 (기준 배치 + 차이)"""
+    seat_ids = list(unpack_arrangement_code(store[history_entry['base']])[-1])
+    for seat, student_id in history_entry['delta']:
+        seat_ids[seat] = student_id
+    return seat_ids
+
+def load_history_entry(history_entry, store=None):
+    """히스토리 항목을 자리 배치로 복원"""
+    if store is None:
+        store = st.session_state.snapshot_store
+    seat_ids = get_history_student_ids(store, history_entry)
+    return student_ids_to_arrangement(seat_ids, store[history_entry['roster']])
+
 def save_to_history(arrangement):
     """자리 배치를 히스토리에 저장"""
     if 'seating_history' not in st.session_state:
         st.session_state.seating_history = []
+    if 'snapshot_store' not in st.session_state:
+        st.session_state.snapshot_store = {}
     
     from datetime import datetime
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    history_entry = {
-        'timestamp': timestamp,
-        'arrangement': arrangement.copy(),
-        'students': st.session_state.students.copy(),
-        'layout_type': st.session_state.layout_type,
-        'rows': st.session_state.rows,
-        'cols': st.session_state.cols
-    }
+    history = st.session_state.seating_history
+    try:
+        history_entry = make_history_entry(
+            st.session_state.snapshot_store, history[-1] if history else None,
+            arrangement, st.session_state.students,
+            st.session_state.layout_type, st.session_state.rows, st.session_state.cols,
+            timestamp
+        )
+    except ValueError as e:
+        st.warning(f"히스토리에 저장하지 못했습니다: {e}")
+        return
     
-    st.session_state.seating_history.append(history_entry)
+    history.append(history_entry)
     
     # 히스토리 크기 제한 (최대 20개)
-    if len(st.session_state.seating_history) > 20:
-        st.session_state.seating_history = st.session_state.seating_history[-20:]
+    if len(history) > HISTORY_LIMIT:
+        st.session_state.seating_history = history[-HISTORY_LIMIT:]
+        prune_snapshot_store(st.session_state.snapshot_store, st.session_state.seating_history)
 
 def create_excel_file():
     """엑셀 파일 생성"""
@@ -522,80 +1799,25 @@ def create_excel_file():
         st.error("먼저 자리 배치를 생성해주세요.")
         return None
     
+    return build_excel_workbook(
+        st.session_state.seating_arrangement, st.session_state.layout_type,
+        st.session_state.rows, st.session_state.cols, st.session_state.is_teacher_view
+    )
+
+def build_excel_workbook(seating_arrangement, layout_type, rows, cols, is_teacher_view=False):
+    """세션 상태 없이 자리 배치 엑셀 파일 생성"""
     # 메모리에서 엑셀 파일 생성
     wb = openpyxl.Workbook()
     ws = wb.active
     ws.title = "자리배치도"
     
-    if st.session_state.layout_type == "pairs":
-        # 분단형 배치
-        sections = st.session_state.rows
-        rows_per_section = st.session_state.cols
-        
-        # 헤더 생성
-        header1 = ['']
-        header2 = ['행']
-        for s in range(sections):
-            section_label = f"{sections - s}분단" if st.session_state.is_teacher_view else f"{s + 1}분단"
-            header1.extend([section_label, ''])
-            header2.extend(['왼쪽', '오른쪽'])
-        
-        ws.append(header1)
-        ws.append(header2)
-        
-        # 데이터 행 생성
-        for r in range(rows_per_section):
-            row_label = f"{rows_per_section - r}행" if st.session_state.is_teacher_view else f"{r + 1}행"
-            row_data = [row_label]
-            
-            for s in range(sections):
-                read_section = sections - 1 - s if st.session_state.is_teacher_view else s
-                read_row = rows_per_section - 1 - r if st.session_state.is_teacher_view else r
-                
-                student_left_index = (read_section * rows_per_section * 2) + (read_row * 2)
-                student_right_index = student_left_index + 1
-                
-                left_index = student_right_index if st.session_state.is_teacher_view else student_left_index
-                right_index = student_left_index if st.session_state.is_teacher_view else student_right_index
-                
-                left_student = st.session_state.seating_arrangement.get(left_index, "")
-                right_student = st.session_state.seating_arrangement.get(right_index, "")
-                
-                row_data.extend([left_student, right_student])
-            
-            ws.append(row_data)
-        
-        # 셀 병합
-        for s in range(sections):
-            ws.merge_cells(start_row=1, start_column=s*2+2, end_row=1, end_column=s*2+3)
+    geometry = get_layout_geometry(layout_type, rows, cols, is_teacher_view)
+    for row_data in get_arrangement_table(seating_arrangement, geometry):
+        ws.append(row_data)
     
-    else:
-        # 기본 배치
-        rows = st.session_state.rows
-        cols = st.session_state.cols
-        
-        # 헤더 생성
-        header = [' ']
-        for c in range(cols):
-            col_label = f"{cols - c}열" if st.session_state.is_teacher_view else f"{c + 1}열"
-            header.append(col_label)
-        
-        ws.append(header)
-        
-        # 데이터 행 생성
-        for r in range(rows):
-            row_label = f"{rows - r}행" if st.session_state.is_teacher_view else f"{r + 1}행"
-            row_data = [row_label]
-            
-            for c in range(cols):
-                read_row = rows - 1 - r if st.session_state.is_teacher_view else r
-                read_col = cols - 1 - c if st.session_state.is_teacher_view else c
-                
-                index = read_row * cols + read_col
-                student = st.session_state.seating_arrangement.get(index, "")
-                row_data.append(student)
-            
-            ws.append(row_data)
+    # 셀 병합
+    for start_row, start_column, end_row, end_column in geometry['excel_merges']:
+        ws.merge_cells(start_row=start_row, start_column=start_column, end_row=end_row, end_column=end_column)
     
     # 스타일 적용
     for row in ws.iter_rows():
@@ -610,12 +1832,158 @@ def create_excel_file():
     
     return excel_buffer
 
+# 일괄 내보내기: 여러 자리 배치를 xlsx/CSV/JSON 파일로 만들어 ZIP으로 스트리밍
+BULK_EXPORT_FORMATS = ("xlsx", "csv", "json")
+BULK_EXPORT_VIEWS = {"student": ("학생기준", False), "teacher": ("교사기준", True)}
+
+def build_csv_file(seating_arrangement, layout_type, rows, cols, is_teacher_view=False):
+    """자리 배치 CSV 파일 생성 (엑셀에서 한글이 깨지지 않도록 BOM 포함)"""
+    text_buffer = StringIO()
+    writer = csv.writer(text_buffer)
+    writer.writerows(get_arrangement_table(
+        seating_arrangement, get_layout_geometry(layout_type, rows, cols, is_teacher_view)
+    ))
+    return text_buffer.getvalue().encode("utf-8-sig")
+
+def build_json_file(seating_arrangement, students, layout_type, rows, cols, name="", timestamp=None):
+    """자리 배치 JSON 파일 생성 (자리 번호는 1부터 시작)"""
+    try:
+        code = encode_arrangement(seating_arrangement, students, layout_type, rows, cols)
+    except ValueError:
+        code = None
+    data = {
+        'name': name,
+        'timestamp': timestamp,
+        'layout_type': layout_type,
+        'rows': rows,
+        'cols': cols,
+        'students': list(students),
+        'seats': {str(seat + 1): student for seat, student in sorted(seating_arrangement.items())},
+        'code': code,
+    }
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+def iter_arrangement_files(name, seating_arrangement, students, layout_type, rows, cols,
+                           formats=BULK_EXPORT_FORMATS, views=tuple(BULK_EXPORT_VIEWS), timestamp=None):
+    """자리 배치 하나를 (ZIP 안 파일 이름, 내용) 순서로 하나씩 생성"""
+    for file_format in formats:
+        if file_format == "json":
+            # JSON은 보기 방향과 관계없이 한 번만 저장
+            yield f"{name}.json", build_json_file(
+                seating_arrangement, students, layout_type, rows, cols, name, timestamp
+            )
+            continue
+        for view in views:
+            view_label, is_teacher_view = BULK_EXPORT_VIEWS[view]
+            if file_format == "xlsx":
+                data = build_excel_workbook(seating_arrangement, layout_type, rows, cols,
+                                            is_teacher_view).getvalue()
+            else:
+                data = build_csv_file(seating_arrangement, layout_type, rows, cols, is_teacher_view)
+            yield f"{name}_{view_label}.{file_format}", data
+
+def get_latest_entries_by_roster(history):
+    """명단별 가장 최근 히스토리 항목 (명단이 처음 나온 순서)"""
+    latest = {}
+    for entry in history:
+        latest[entry['roster']] = entry
+    entries = []
+    for entry in history:
+        if latest.get(entry['roster']) is entry:
+            entries.append(entry)
+    return entries
+
+def iter_history_export_files(history, store, formats=BULK_EXPORT_FORMATS,
+                              views=tuple(BULK_EXPORT_VIEWS), by_roster=False):
+    """히스토리(또는 명단별 최근 배치)를 하나씩 복원하며 내보낼 파일 생성"""
+    entries = get_latest_entries_by_roster(history) if by_roster else history
+    for number, entry in enumerate(entries, 1):
+        layout_type, rows, cols = store[entry['layout']]
+        students = store[entry['roster']]
+        stamp = entry['timestamp'].replace(":", "").replace(" ", "_")
+        name = f"명단{number}_{stamp}" if by_roster else f"{number:03d}_{stamp}"
+        yield from iter_arrangement_files(
+            name, load_history_entry(entry, store), students, layout_type, rows, cols,
+            formats, views, entry['timestamp']
+        )
+
+class ChunkBuffer:
+    """ZipFile이 쓴 바이트를 모아 두었다가 조각으로 꺼내는 쓰기 전용 스트림"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def iter_zip_chunks(files):
+    """(파일 이름, 내용)을 차례로 압축하며 ZIP 바이트 조각 생성
+    
+    파일을 하나 쓸 때마다 압축된 조각을 내보내므로 메모리에는 파일 하나와
+    ZIP 목차만 남는다.
+    """
+    stream = ChunkBuffer()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for file_name, data in files:
+            zip_file.writestr(file_name, data)
+            chunk = stream.drain()
+            if chunk:
+                yield chunk
+    chunk = stream.drain()
+    if chunk:
+        yield chunk
+
+def build_bulk_export(files):
+    """ZIP 조각을 이어 붙여 다운로드용 ZIP 바이트 만들기
+    
+    파일은 하나씩 만들어 바로 압축하므로 메모리에는 압축된 ZIP과 파일 하나만 남는다.
+    (Streamlit 다운로드는 완성된 ZIP을 메모리에 보관하므로, 압축 전 파일을 모두
+    메모리에 두지 않고 스트리밍하는 것은 API 서버의 /export/bulk이다.)
+    """
+    return b"".join(iter_zip_chunks(files))
+
+def load_shared_link():
+    """공유 링크(쿼리 파라미터)의 명단과 자리 배치 불러오기"""
+    if st.session_state.get('shared_link_loaded'):
+        return
+    st.session_state.shared_link_loaded = True
+    
+    if 'seats' not in st.query_params:
+        return
+    
+    try:
+        students = st.session_state.students
+        if 'roster' in st.query_params:
+            students = decode_roster(st.query_params['roster'])
+        arrangement, layout_type, rows, cols = decode_arrangement(st.query_params['seats'], students)
+    except ValueError as e:
+        st.error(f"공유 링크를 불러오지 못했습니다: {e}")
+        return
+    
+    st.session_state.students = students
+    st.session_state.layout_type = layout_type
+    st.session_state.rows = rows
+    st.session_state.cols = cols
+    set_seating_arrangement(arrangement)
+    st.success("공유된 자리 배치를 불러왔습니다.")
+
 # 메인 UI
 def main():
     st.title("🏫 자리 바꾸기 프로그램")
     st.markdown("**간편하고 빠른 자리 배치로 교실 분위기를 새롭게! 교실 속 자리 배치 도우미**")
     st.markdown("*Made by 슬쌤 / 📧 seulwhite17@gmail.com*")
     
+    load_shared_link()
+    
     # 사이드바
     with st.sidebar:
         st.header("1. 명단 입력")
@@ -645,24 +2013,30 @@ def main():
         layout_type = st.selectbox(
             "배치 유형",
             ["default", "pairs"],
+            index=["default", "pairs"].index(st.session_state.layout_type),
             format_func=lambda x: "기본" if x == "default" else "짝꿍 (분단형)"
         )
         st.session_state.layout_type = layout_type
         
-        # 행/열 설정
+        # 행/열 설정 (공유 링크로 불러온 크기를 기본값으로 사용)
+        size_limit = LAYOUT_SIZE_LIMITS[layout_type]
         if layout_type == "pairs":
-            cols = st.number_input("분단 수", min_value=1, max_value=10, value=3)
-            rows = st.number_input("행 수", min_value=1, max_value=10, value=5)
+            cols = st.number_input("분단 수", min_value=1, max_value=size_limit,
+                                   value=min(st.session_state.cols, size_limit))
+            rows = st.number_input("행 수", min_value=1, max_value=size_limit,
+                                   value=min(st.session_state.rows, size_limit))
         else:
-            rows = st.number_input("행 (가로)", min_value=1, max_value=15, value=5)
-            cols = st.number_input("열 (세로)", min_value=1, max_value=15, value=6)
+            rows = st.number_input("행 (가로)", min_value=1, max_value=size_limit,
+                                   value=min(st.session_state.rows, size_limit))
+            cols = st.number_input("열 (세로)", min_value=1, max_value=size_limit,
+                                   value=min(st.session_state.cols, size_limit))
         
         st.session_state.rows = rows
         st.session_state.cols = cols
         
         # 배열 적용 버튼
         if st.button("배열 적용"):
-            st.session_state.seating_arrangement = {}
+            set_seating_arrangement({})
             st.session_state.pre_assigned_seats = {}
             st.session_state.disabled_seats = []
             st.success("배치가 적용되었습니다.")
@@ -711,6 +2085,42 @@ def main():
                     for seat_idx, student in st.session_state.pre_assigned_seats.items():
                         st.write(f"• {seat_idx + 1}번 자리: {student}")
         
+        # 자리 조건
+        with st.expander("🎯 자리 조건"):
+            if st.session_state.students:
+                constraint_student = st.selectbox(
+                    "조건을 지정할 학생 선택",
+                    [""] + st.session_state.students,
+                    key="constraint_student"
+                )
+                
+                if constraint_student:
+                    constraint_rules = st.multiselect(
+                        "앉을 수 있는 자리 조건",
+                        options=list(SEAT_RULES),
+                        default=st.session_state.seat_constraints.get(constraint_student, []),
+                        format_func=lambda key: SEAT_RULES[key][0],
+                        help="창가는 1열(분단형은 1분단) 쪽으로 봅니다."
+                    )
+                    
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        if st.button("조건 적용"):
+                            st.session_state.seat_constraints[constraint_student] = constraint_rules
+                            st.success(f"{constraint_student} 학생의 자리 조건을 적용했습니다.")
+                    
+                    with col2:
+                        if st.button("조건 해제"):
+                            st.session_state.seat_constraints.pop(constraint_student, None)
+                            st.success(f"{constraint_student} 학생의 자리 조건을 해제했습니다.")
+                
+                # 조건 목록
+                if st.session_state.seat_constraints:
+                    st.write("**자리 조건:**")
+                    for student, rules in st.session_state.seat_constraints.items():
+                        if rules:
+                            st.write(f"• {student}: {', '.join(SEAT_RULES[key][0] for key in rules)}")
+        
         # 자리 띄우기
         with st.expander("🧍↔️ 자리 띄우기"):
             if st.session_state.students:
@@ -755,6 +2165,8 @@ def main():
         with st.expander("📚 배치 히스토리"):
             if 'seating_history' not in st.session_state:
                 st.session_state.seating_history = []
+            if 'snapshot_store' not in st.session_state:
+                st.session_state.snapshot_store = {}
             
             if st.session_state.seating_history:
                 st.write("**최근 자리 배치 기록:**")
@@ -765,12 +2177,14 @@ def main():
                             st.write(f"{i}. {history['timestamp']}")
                         with col2:
                             if st.button(f"불러오기", key=f"load_{i}"):
-                                st.session_state.seating_arrangement = history['arrangement']
+                                set_seating_arrangement(load_history_entry(history))
                                 st.success("히스토리가 불러와졌습니다.")
                                 st.rerun()
                         with col3:
                             if st.button(f"삭제", key=f"delete_{i}"):
                                 st.session_state.seating_history.pop(-i)
+                                prune_snapshot_store(st.session_state.snapshot_store,
+                                                     st.session_state.seating_history)
                                 st.success("히스토리가 삭제되었습니다.")
                                 st.rerun()
             else:
@@ -778,7 +2192,40 @@ def main():
             
             if st.button("히스토리 모두 삭제"):
                 st.session_state.seating_history = []
+                st.session_state.snapshot_store = {}
                 st.success("모든 히스토리가 삭제되었습니다.")
+            
+            # 히스토리 일괄 내보내기
+            if st.session_state.seating_history:
+                st.write("**일괄 내보내기 (ZIP):**")
+                export_scope = st.radio("내보낼 배치", ["전체 히스토리", "명단별 최근 배치"], horizontal=True)
+                export_formats = st.multiselect("파일 형식", list(BULK_EXPORT_FORMATS),
+                                                default=list(BULK_EXPORT_FORMATS))
+                export_views = st.multiselect(
+                    "보기 방향", list(BULK_EXPORT_VIEWS), default=list(BULK_EXPORT_VIEWS),
+                    format_func=lambda view: BULK_EXPORT_VIEWS[view][0]
+                )
+                export_error = None
+                if not export_formats:
+                    export_error = "파일 형식을 하나 이상 선택해주세요."
+                elif not export_views and export_formats != ["json"]:
+                    export_error = "보기 방향을 하나 이상 선택해주세요."
+                if export_error:
+                    st.caption(export_error)
+                
+                # ZIP은 다운로드를 누를 때 별도 스레드에서 만들므로 지금의 히스토리를 복사해 둠
+                export_history = list(st.session_state.seating_history)
+                export_store = dict(st.session_state.snapshot_store)
+                by_roster = export_scope == "명단별 최근 배치"
+                st.download_button(
+                    label="📦 ZIP 다운로드",
+                    data=lambda: build_bulk_export(iter_history_export_files(
+                        export_history, export_store, export_formats, export_views, by_roster
+                    )),
+                    file_name="자리배치_일괄내보내기.zip",
+                    mime="application/zip",
+                    disabled=export_error is not None
+                )
         
         # 배치 통계
         with st.expander("📊 배치 통계"):
@@ -806,23 +2253,42 @@ def main():
                     st.warning("⚠️ 자리 수와 학생 수가 정확히 일치합니다.")
                 else:
                     st.success("✅ 배치 가능합니다.")
+                
+                # 모든 세션이 공유하는 좌표 표 캐시 상태
+                cache_info = geometry_cache.info()
+                st.caption(f"배치 좌표 캐시: {cache_info['entries']}/{cache_info['max_entries']}개 형태, "
+                           f"약 {cache_info['bytes'] / 1024:.1f} KB (적중 {cache_info['hits']}회)")
         
         # 고급 옵션
         with st.expander("⚙️ 고급 옵션"):
             # 랜덤 시드 설정
+            # 시드 탐색에서 적용한 시드가 입력란에도 보이도록 세션 상태와 연결
+            if 'random_seed_input' not in st.session_state:
+                st.session_state.random_seed_input = getattr(st.session_state, 'random_seed', 42)
             random_seed = st.number_input(
                 "랜덤 시드 (재현 가능한 배치를 위해)",
                 min_value=0,
                 max_value=999999,
-                value=42,
+                key="random_seed_input",
                 help="같은 시드를 사용하면 동일한 배치 결과를 얻을 수 있습니다."
             )
             
             # 배치 알고리즘 옵션
             algorithm = st.selectbox(
                 "배치 알고리즘",
-                ["기본", "균형 배치", "그룹 분산"],
-                help="다양한 배치 알고리즘을 선택할 수 있습니다."
+                ALGORITHMS,
+                help="다양한 배치 알고리즘을 선택할 수 있습니다. "
+                     "짝꿍 최적화는 분단형 배치에서 과거 히스토리의 짝과 겹치지 않도록 짝을 정합니다. "
+                     "균등 샘플링은 조건을 지키는 모든 배치 중에서 치우침 없이 고릅니다."
+            )
+            
+            # 그룹 분산 그룹 수
+            group_count = st.number_input(
+                "그룹 수 (그룹 분산)",
+                min_value=GROUP_COUNT_RANGE[0],
+                max_value=GROUP_COUNT_RANGE[1],
+                value=4,
+                help="그룹 분산 알고리즘에서 교실을 나눌 영역(그룹)의 수입니다."
             )
             
             # 자동 저장 옵션
@@ -836,6 +2302,7 @@ def main():
             if st.button("설정 저장"):
                 st.session_state.random_seed = random_seed
                 st.session_state.algorithm = algorithm
+                st.session_state.group_count = group_count
                 st.session_state.auto_save = auto_save
                 st.success("설정이 저장되었습니다.")
     
@@ -854,7 +2321,7 @@ def main():
         
         with button_col2:
             if st.button("🗑️ 모두 지우기", use_container_width=True):
-                st.session_state.seating_arrangement = {}
+                set_seating_arrangement({})
                 st.success("모든 자리가 지워졌습니다.")
         
         with button_col3:
@@ -869,16 +2336,106 @@ def main():
                         use_container_width=True
                     )
         
-        # 자리 배치도 표시
+        # 시드 탐색
+        with st.expander("🔍 시드 탐색 (좋은 배치 찾기)"):
+            st.caption("여러 시드로 현재 설정과 알고리즘의 배치를 만들어 자리 띄우기 위반, "
+                       "히스토리와 겹치는 이웃, 영역별 인원 균형을 채점합니다. 점수가 낮을수록 좋습니다.")
+            explore_col1, explore_col2, explore_col3 = st.columns(3)
+            with explore_col1:
+                seed_count = st.number_input("탐색할 시드 수", min_value=100, max_value=20000, value=2000, step=100)
+            with explore_col2:
+                start_seed = st.number_input("시작 시드", min_value=0, max_value=999999, value=0)
+            with explore_col3:
+                top_k = st.number_input("상위 개수", min_value=1, max_value=20, value=5)
+            
+            if st.button("탐색 시작"):
+                if not st.session_state.students:
+                    st.error("먼저 학생 명단을 입력해주세요.")
+                else:
+                    history_neighbor_pairs = get_history_neighbor_pairs(
+                        st.session_state.get('seating_history', []), st.session_state.get('snapshot_store', {})
+                    )
+                    seeds = range(start_seed, min(start_seed + seed_count, 1000000))
+                    started = time.perf_counter()
+                    with st.spinner("시드를 탐색하는 중..."):
+                        st.session_state.seed_explorer_results = explore_seeds(
+                            get_session_build_config(), seeds, top_k,
+                            history_neighbor_pairs, get_explorer_pool()
+                        )
+                    st.success(f"{len(seeds)}개 시드 탐색 완료 ({time.perf_counter() - started:.1f}초)")
+            
+            results = st.session_state.get('seed_explorer_results')
+            if results:
+                st.dataframe(pd.DataFrame([{
+                    '시드': result['seed'],
+                    '점수': result['score'],
+                    '자리 띄우기 위반': result['violations'],
+                    '과거 이웃 반복': result['repeats'],
+                    '영역 균형(표준편차)': result['balance']
+                } for result in results]), hide_index=True)
+                
+                chosen_seed = st.selectbox("적용할 시드", [result['seed'] for result in results])
+                if st.button("이 시드로 자리 바꾸기", on_click=apply_random_seed, args=(chosen_seed,)):
+                    generate_seating_arrangement()
+            elif results is not None:
+                st.warning("배치할 수 있는 시드가 없습니다. 설정을 확인해주세요.")
+        
+        # 균등 샘플링 진단
+        with st.expander("📈 균등 샘플링 진단 (공정성 확인)"):
+            st.caption("조건을 지키는 배치를 여러 마르코프 연쇄로 고르게 뽑아, 학생별 평균 행과 "
+                       "수락률, R-hat(1.1 미만이면 잘 섞임), 유효 표본 수를 보여줍니다.")
+            sampler_col1, sampler_col2 = st.columns(2)
+            with sampler_col1:
+                sampler_chains = st.number_input("연쇄 수", min_value=2, max_value=16, value=4)
+            with sampler_col2:
+                sampler_samples = st.number_input("연쇄별 표본 수", min_value=50, max_value=5000, value=500, step=50)
+            
+            if st.button("샘플링 시작"):
+                if not st.session_state.students:
+                    st.error("먼저 학생 명단을 입력해주세요.")
+                else:
+                    config = get_validation_config(get_session_build_config())
+                    try:
+                        with st.spinner("배치를 샘플링하는 중..."):
+                            _, st.session_state.sampler_diagnostics = sample_arrangements(
+                                config, sampler_samples, sampler_chains,
+                                getattr(st.session_state, 'random_seed', 42), executor=get_explorer_pool()
+                            )
+                    except ValueError as e:
+                        st.error(str(e))
+            
+            diagnostics = st.session_state.get('sampler_diagnostics')
+            if diagnostics:
+                metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+                metric_col1.metric("수락률", f"{diagnostics['acceptance_rate']:.1%}",
+                                   help=f"상태가 그대로인 제안(같은 자리, 빈 자리끼리) "
+                                        f"{diagnostics['noop_rate']:.1%}는 제외한 비율입니다.")
+                metric_col2.metric("최대 R-hat", f"{diagnostics['r_hat']:.3f}")
+                metric_col3.metric("최소 유효 표본 수", f"{diagnostics['ess']:.0f}")
+                metric_col4.metric("표본/초", f"{diagnostics['samples_per_second']:,.0f}")
+                st.dataframe(pd.DataFrame([
+                    {'학생': student, '평균 행': round(mean_row, 2)}
+                    for student, mean_row in diagnostics['mean_rows'].items()
+                ]), hide_index=True)
+        
+        # 자리 배치도 표시 (자리를 차례로 두 번 클릭하면 두 자리를 바꿈)
         if st.session_state.seating_arrangement:
-            fig = create_seating_chart(
-                st.session_state.seating_arrangement,
-                st.session_state.layout_type,
-                st.session_state.rows,
-                st.session_state.cols,
-                st.session_state.is_teacher_view
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            chart_key = f"seating_chart_{st.session_state.get('chart_nonce', 0)}"
+            chart_event = st.session_state.get(chart_key)
+            if chart_event and chart_event.selection.points:
+                handle_seat_click(chart_event.selection.points[0]["point_index"])
+                # 같은 자리를 다시 클릭할 수 있도록 차트 선택 상태 초기화
+                st.session_state.chart_nonce = st.session_state.get('chart_nonce', 0) + 1
+                chart_key = f"seating_chart_{st.session_state.chart_nonce}"
+            
+            source = st.session_state.get('swap_source')
+            if source is not None:
+                st.caption(f"{source + 1}번 자리를 선택했습니다. 바꿀 자리를 클릭하세요. (같은 자리를 다시 클릭하면 취소)")
+            else:
+                st.caption("자리를 클릭한 뒤 다른 자리를 클릭하면 두 자리가 바뀝니다.")
+            
+            st.plotly_chart(get_seating_figure(), use_container_width=True,
+                            on_select="rerun", selection_mode="points", key=chart_key)
         else:
             st.info("자리 배치를 생성하려면 '자리 바꾸기!' 버튼을 클릭하세요.")
     
@@ -890,6 +2447,19 @@ def main():
             st.session_state.is_teacher_view = not st.session_state.is_teacher_view
             st.rerun()
         
+        # 공유 링크 생성
+        if st.session_state.seating_arrangement:
+            if st.button("🔗 공유 링크 만들기"):
+                try:
+                    st.query_params['seats'] = encode_arrangement(
+                        st.session_state.seating_arrangement, st.session_state.students,
+                        st.session_state.layout_type, st.session_state.rows, st.session_state.cols
+                    )
+                    st.query_params['roster'] = encode_roster(st.session_state.students)
+                    st.success("주소창의 링크를 복사해 공유하세요.")
+                except ValueError as e:
+                    st.error(f"공유 링크를 만들지 못했습니다: {e}")
+        
         # 사용법 안내
         st.markdown("""
         ### 📖 사용법
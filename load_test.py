@@ -0,0 +1,109 @@
+"""자리 배치 API 부하 테스트
+
+실행 중인 api_server.py에 동시에 요청을 보내 초당 처리량과 지연 시간을 측정한다.
+
+실행:
+    python api_server.py --workers 4
+    python load_test.py --concurrency 16 --duration 10 --students 30
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def post_json(url, payload, timeout):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+def make_payload(args, seed):
+    payload = {
+        "students": [f"학생{i + 1}" for i in range(args.students)],
+        "layout_type": args.layout_type,
+        "rows": args.rows,
+        "cols": args.cols,
+        "distanced_students": [f"학생{i + 1}" for i in range(args.distanced)],
+        "algorithm": args.algorithm,
+        "seed": seed,
+    }
+    if args.endpoint == "/export":
+        payload["teacher_view"] = seed % 2 == 0
+    return payload
+
+
+def worker(args, deadline, latencies, errors, lock):
+    rng = random.Random()
+    url = args.url.rstrip("/") + args.endpoint
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            post_json(url, make_payload(args, rng.randrange(1000000)), args.timeout)
+            ok = True
+        except (urllib.error.URLError, OSError):
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="자리 배치 API 부하 테스트")
+    parser.add_argument("--url", default="http://127.0.0.1:8600")
+    parser.add_argument("--endpoint", default="/generate", choices=["/generate", "/export"])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="측정 시간 (초)")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--distanced", type=int, default=3, help="자리 띄우기 학생 수")
+    parser.add_argument("--layout-type", default="default", choices=["default", "pairs"])
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--cols", type=int, default=6)
+    parser.add_argument("--algorithm", default="기본")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [threading.Thread(target=worker, args=(args, deadline, latencies, errors, lock))
+               for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    print(f"요청: {len(latencies)}건 성공, {len(errors)}건 실패 ({elapsed:.1f}초, 동시 {args.concurrency})")
+    print(f"처리량: {len(latencies) / elapsed:.1f} req/s")
+    print(f"지연 시간(ms): p50 {percentile(latencies, 0.50):.1f} / "
+          f"p95 {percentile(latencies, 0.95):.1f} / p99 {percentile(latencies, 0.99):.1f}")
+
+    try:
+        with urllib.request.urlopen(args.url.rstrip("/") + "/metrics", timeout=args.timeout) as response:
+            metrics = json.loads(response.read())
+        print(f"서버 통계: {json.dumps(metrics, ensure_ascii=False)}")
+    except (urllib.error.URLError, OSError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
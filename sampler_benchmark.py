@@ -0,0 +1,98 @@
+"""균등 샘플링(MCMC) 성능 및 치우침 측정
+
+조건을 지키는 배치를 마르코프 연쇄로 뽑으며 초당 표본 수, 수락률, R-hat, 유효 표본 수를
+출력하고, 기본 알고리즘과 자리 띄우기 학생들의 평균 행을 비교한다.
+
+실행:
+    python sampler_benchmark.py --students 28 --distanced 4 --chains 4 --samples 1000
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import streamlit.logger
+
+# app.py를 streamlit run 없이 불러올 때 나오는 세션 상태 경고 숨기기
+streamlit.logger.set_log_level("error")
+
+import app
+
+
+def make_config(args):
+    students = [f"학생{i + 1}" for i in range(args.students)]
+    return {
+        "students": students,
+        "layout_type": args.layout_type,
+        "rows": args.rows,
+        "cols": args.cols,
+        "disabled_seats": [],
+        "pre_assigned_seats": {},
+        "distanced_students": students[:args.distanced],
+        "seat_constraints": {},
+    }
+
+
+def greedy_mean_rows(config, seeds):
+    """기본 알고리즘으로 여러 시드를 배치했을 때 학생별 평균 행"""
+    coords = app.get_layout_geometry(config["layout_type"], config["rows"], config["cols"])["coords"]
+    totals = dict.fromkeys(config["students"], 0.0)
+    for seed in range(seeds):
+        arrangement = app.build_arrangement(seed=seed, **config)
+        for seat, student in arrangement.items():
+            totals[student] += coords[seat][0]
+    return {student: total / seeds + 1 for student, total in totals.items()}
+
+
+def print_diagnostics(label, diagnostics):
+    print(f"[{label}] 표본 {diagnostics['samples']}개, {diagnostics['elapsed']:.2f}초")
+    print(f"  처리량: {diagnostics['samples_per_second']:,.0f} 표본/s, "
+          f"{diagnostics['proposals_per_second']:,.0f} 제안/s")
+    print(f"  수락률: {diagnostics['acceptance_rate']:.1%} "
+          f"(연쇄별 {', '.join(f'{rate:.1%}' for rate in diagnostics['chain_acceptance_rates'])}, "
+          f"상태가 그대로인 제안 {diagnostics['noop_rate']:.1%} 제외)")
+    print(f"  최대 R-hat: {diagnostics['r_hat']:.3f} / 최소 유효 표본 수: {diagnostics['ess']:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="균등 샘플링(MCMC) 성능 및 치우침 측정")
+    parser.add_argument("--students", type=int, default=28)
+    parser.add_argument("--distanced", type=int, default=4, help="자리 띄우기 학생 수")
+    parser.add_argument("--layout-type", default="default", choices=["default", "pairs"])
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--cols", type=int, default=6)
+    parser.add_argument("--chains", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=1000, help="연쇄별 표본 수")
+    parser.add_argument("--thin", type=int, default=app.MCMC_THIN_SWEEPS, help="표본 사이 sweep 수")
+    parser.add_argument("--greedy-seeds", type=int, default=2000, help="비교할 기본 알고리즘 시드 수")
+    parser.add_argument("--workers", type=int, default=0, help="병렬 연쇄용 작업 프로세스 수 (0이면 순차)")
+    args = parser.parse_args()
+
+    config = make_config(args)
+    _, diagnostics = app.sample_arrangements(config, args.samples, args.chains, thin_sweeps=args.thin)
+    print_diagnostics("순차", diagnostics)
+
+    if args.workers:
+        with ProcessPoolExecutor(max_workers=args.workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            # 작업 프로세스를 미리 띄워 시작 시간을 측정에서 제외
+            list(executor.map(time.sleep, [0.5] * args.workers))
+            _, parallel = app.sample_arrangements(config, args.samples, args.chains,
+                                                  thin_sweeps=args.thin, executor=executor)
+        print_diagnostics(f"병렬 {args.workers}", parallel)
+
+    if args.distanced and args.greedy_seeds:
+        started = time.perf_counter()
+        greedy = greedy_mean_rows(config, args.greedy_seeds)
+        elapsed = time.perf_counter() - started
+        print(f"자리 띄우기 학생 평균 행 (기본 알고리즘 {args.greedy_seeds}개 시드, {elapsed:.2f}초 / 균등 샘플링):")
+        for student in config["distanced_students"]:
+            print(f"  {student}: {greedy[student]:.2f} / {diagnostics['mean_rows'][student]:.2f}")
+        others = [student for student in config["students"] if student not in config["distanced_students"]]
+        print(f"  나머지 학생 평균: {np.mean([greedy[s] for s in others]):.2f} / "
+              f"{np.mean([diagnostics['mean_rows'][s] for s in others]):.2f}")
+
+
+if __name__ == "__main__":
+    main()